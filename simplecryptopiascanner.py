@@ -12,22 +12,29 @@
 import os
 import sys
 import time
+import re
 import json
-from urllib.request import Request, urlopen
+import ssl
+import codecs
+import struct
+import random
+import asyncio
+import signal
+import gc
+import math
+from collections import namedtuple, Counter, deque
+# urllib.request is imported where it's used: It's only needed for synchronous downloads,
+# which MarketsFetcher (and with it, refreshAll) only does through proxies. So are
+# multiprocessing, csv, heapq and argparse, which only backfilling, signal scans and the
+# command line need.
+from urllib.parse import urlsplit, urljoin
 
 #=============================
 # Third party.
 import arrow
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as pyplot
-# Kivy
-import kivy
-import kivy.app
-# https://github.com/kivy-garden/garden.matplotlib
-# Could also be obtained through garden install matplotlib
-# Might fancy just linking the repository to make deployment less of a clusterfudge.
-from kivy.garden.matplotlib import FigureCanvasKivyAgg
+# Kivy, matplotlib and pandas aren't imported here, see "GUI Classes" below. pandas and pyarrow
+# are imported by the .toDataFrame and .toArrowTable methods that need them.
 
 #=============================
 # Internal.
@@ -41,6 +48,8 @@ from lib.azirolib.debugging import dprint
 symbols = ["NEBL"]
 defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
 defaultUpdateInterval = 360 # In seconds.
+defaultAddressTemplate = "https://www.cryptopia.co.nz/api/GetMarketHistory/{symbol}_BTC/"
+defaultOrderBookAddressTemplate = "https://www.cryptopia.co.nz/api/GetMarketOrders/{symbol}_BTC/"
 
 #=======================================================================================
 # Library
@@ -56,13 +65,165 @@ class MarketHistoryTimeWindowError(Exception):
 	pass
 class MarketHistoryTimeWindowOrderOutOfBoundsError(Exception):
 	pass
+class DataFetchError(Exception):
+	pass
+class DataFetchRetryableError(DataFetchError):
+	pass
+class TradeStoreError(Exception):
+	pass
+class OrderBookStoreError(Exception):
+	pass
 
 #==========================================================
 # GUI Classes
 #==========================================================
+# Kept in simplecryptopiascannergui, so that headless use
+# (fetching, storing, aggregating) doesn't pay for importing
+# kivy and matplotlib. Accessing them through this module
+# still works, it just imports them on first access.
 
-class Gui(kivy.app.App):
-	pass
+guiNames = ("Graph", "Gui")
+
+def __getattr__(name):
+	if name in guiNames:
+		import simplecryptopiascannergui
+		return getattr(simplecryptopiascannergui, name)
+	raise AttributeError("module {module!r} has no attribute {name!r}".format(module=__name__, name=name))
+
+#==========================================================
+# Metrics
+#==========================================================
+# Counters and histograms of where time goes when fetching,
+# parsing and aggregating. Off unless metrics.enabled is set,
+# in which case every instrumented call costs a few function
+# calls; when off, it's an attribute lookup.
+
+class Histogram(object):
+
+	"""Distribution of observed values, in buckets of powers of two, plus their count, sum,
+	minimum and maximum. Quantiles are estimated from the buckets, so they're accurate to
+	within a factor of two, which is plenty for telling where time goes."""
+
+	def __init__(self):
+		self.count = 0
+		self.total = 0.0
+		self.minimum = None
+		self.maximum = None
+		# Exponent (as by math.frexp) of the upper bound of a bucket: Values in it.
+		self.buckets = {}
+
+	def add(self, value):
+		self.count += 1
+		self.total += value
+		if self.minimum is None or value < self.minimum:
+			self.minimum = value
+		if self.maximum is None or value > self.maximum:
+			self.maximum = value
+		exponent = math.frexp(value)[1] if value > 0 else None
+		self.buckets[exponent] = self.buckets.get(exponent, 0) + 1
+
+	@property
+	def mean(self):
+		return self.total / self.count if self.count > 0 else None
+
+	def quantile(self, fraction):
+		"""Upper bound of the bucket the value at fraction (0 to 1) of the observations is in,
+		capped by the maximum."""
+		if self.count == 0:
+			return None
+		rank = max(1, math.ceil(fraction * self.count))
+		seen = 0
+		# Zero and negative values (bucket None) come first.
+		for exponent in sorted(self.buckets, key=lambda exponent: -math.inf if exponent is None else exponent):
+			seen += self.buckets[exponent]
+			if seen >= rank:
+				return self.minimum if exponent is None else min(math.ldexp(1.0, exponent), self.maximum)
+		return self.maximum
+
+	def summary(self):
+		return {"count": self.count, "sum": self.total, "min": self.minimum, "mean": self.mean,\
+			"p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": self.maximum}
+
+class _Timing(object):
+
+	"""Observes the seconds its with block took in a histogram. .seconds holds them after."""
+
+	def __init__(self, metrics, name):
+		self.metrics = metrics
+		self.name = name
+		self.seconds = None
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exception):
+		self.seconds = time.perf_counter() - self.start
+		self.metrics.observe(self.name, self.seconds)
+
+class _NoTiming(object):
+
+	"""Stands in for _Timing while metrics are disabled."""
+
+	seconds = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		pass
+
+_noTiming = _NoTiming()
+
+class Metrics(object):
+
+	"""Named counters and histograms (see Histogram). Nothing is recorded unless .enabled.
+
+	Names are dotted, starting with where they're recorded, like "data.download.seconds".
+	Timings are in seconds, sizes in bytes.
+
+	Parameters:
+
+		enabled (bool): Default: False
+			Whether to record anything."""
+
+	def __init__(self, enabled=False):
+		self.enabled = enabled
+		self.reset()
+
+	def reset(self):
+		self.counters = {}
+		self.histograms = {}
+
+	def count(self, name, value=1):
+		if self.enabled:
+			self.counters[name] = self.counters.get(name, 0) + value
+
+	def observe(self, name, value):
+		if self.enabled:
+			if not name in self.histograms:
+				self.histograms[name] = Histogram()
+			self.histograms[name].add(value)
+
+	def timing(self, name):
+		"""A context manager observing the seconds its with block takes under name."""
+		return _Timing(self, name) if self.enabled else _noTiming
+
+	def snapshot(self):
+		"""The counters and histogram summaries as a dict, ready for json.dump."""
+		return {"counters": dict(self.counters),\
+			"histograms": {name: histogram.summary() for name, histogram in self.histograms.items()}}
+
+	def report(self):
+		"""The counters and histograms as lines of text."""
+		lines = ["{name:<40} {value:>14}".format(name=name, value=value) for name, value in sorted(self.counters.items())]
+		for name, histogram in sorted(self.histograms.items()):
+			lines.append("{name:<40} {count:>6}x  mean {mean:<10.4g} p50 {p50:<10.4g} p95 {p95:<10.4g} max {max:.4g}"\
+				.format(name=name, **histogram.summary()))
+		return "\n".join(lines)
+
+# Shared by everything in here. Set metrics.enabled = True to start recording.
+metrics = Metrics()
 
 #==========================================================
 # API Neutral Classes
@@ -71,9 +232,17 @@ class Gui(kivy.app.App):
 # software, and should not need changing upon implementing
 # a new API.
 
+# A single trade as read back from TradeColumns. Side is 1 for buys and -1 for sells.
+Trade = namedtuple("Trade", ["timestamp", "price", "amount", "total", "side"])
+
+# Fixed-width, little endian binary record of a trade, as stored by TradeStore (40 bytes).
+tradeRecordDtype = np.dtype([("timestamp", "<i8"), ("price", "<f8"), ("amount", "<f8"),\
+	("total", "<f8"), ("side", "i1"), ("padding", "V7")])
+
 class FilledOrder(object):
 	"""Represents a filled order in the market history.
-	Models the data from the GetMarketHistory API call."""
+	Models the data from the GetMarketHistory API call: .data is the raw trade, a dict keyed
+	like the API lists it, even for trades read back from TradeColumns."""
 	
 	def __init__(self, timestamp, data):
 		# We are getting the timestamp here because we need it, and we
@@ -81,9 +250,36 @@ class FilledOrder(object):
 		self.timestamp = timestamp
 		self.data = data
 
+def floorTimestamp(timestamp, seconds):
+	"""Returns the beginning of the time window of the specified length in seconds, aligned to
+	the UNIX epoch, the UNIX timestamp falls into. Works on ints and numpy arrays alike."""
+	return timestamp - timestamp % seconds
+
+def nextBoundary(timestamp, seconds):
+	"""Returns the beginning of the time window following the one the timestamp falls into."""
+	return timestamp - timestamp % seconds + seconds
+
+def _checkInterval(seconds):
+	"""Raises a ValueError if seconds isn't a valid length of time windows: A positive integer."""
+	if isinstance(seconds, bool) or not isinstance(seconds, (int, np.integer)) or seconds <= 0:
+		raise ValueError("Time windows have to be a positive integer number of seconds long, not {0!r}."\
+			.format(seconds))
+
 class Datetime(arrow.Arrow):
 	"""Represents a date and time in various formats.
-	Takes a UNIX timestamp for the constructor."""
+	Takes a UNIX timestamp for the constructor, and is in UTC then.
+	
+	Creating these is comparatively expensive, so they're meant for presenting timestamps.
+	For calculations, stick to integer timestamps and floorTimestamp/nextBoundary."""
+	
+	def __init__(self, *args, **kwargs):
+		if len(args) == 1 and len(kwargs) == 0:
+			moment = arrow.Arrow.utcfromtimestamp(args[0])
+			super().__init__(moment.year, moment.month, moment.day, moment.hour, moment.minute,\
+				moment.second, moment.microsecond, tzinfo=moment.tzinfo)
+		else: # Arrow creates new objects of our class with the full set of arguments.
+			super().__init__(*args, **kwargs)
+	
 	#def __init__(self):
 		#self.timestamp = timestamp
 		#self.datetime = arrow.fromtimestamp(self.timestamp)
@@ -108,28 +304,36 @@ class Datetime(arrow.Arrow):
 	@property
 	def nextSecondBegin(self):
 		"""Return Datetime object shifted to the next second, zero microseconds."""
-		return self.getShifted(second=self.second+1, microsecond=0)
+		return self.replace(microsecond=0).shift(seconds=1)
 		
 	@property
 	def nextMinuteBegin(self):
 		"""Return Datetime object shifted to the next minute, zero seconds and zero microseconds."""
-		
+		return self.replace(second=0, microsecond=0).shift(minutes=1)
 		
 	@property
 	def nextSecond(self):
-		return self.replace(second=self.second+1, microsecond=0)
+		return self.nextSecondBegin
 		
 	@property
 	def nextMinute(self):
-		return self.replace(minute=self.minute+1, second=0, microsecond=0)
+		return self.nextMinuteBegin
 
 class MarketHistoryTimeWindow(object):
 	"""Groups filled orders of a specified time window of the market history together."""
 	def __init__(self, begin=0, end=0):
-		self.filledOrders = []
+		self._filledOrders = []
 		self._begin = begin
 		self._end = end
 		
+	@property
+	def filledOrders(self):
+		return self._filledOrders
+	
+	@filledOrders.setter
+	def filledOrders(self, filledOrders):
+		self._filledOrders = filledOrders
+		
 	@property
 	def begin(self):
 		"""UNIX timestamp of the second denoting the begin of this window."""
@@ -174,12 +378,6 @@ class MarketHistoryTimeWindow(object):
 			self.begin = timestamp
 		if self._begin == 0: # Not initialized yet - it's time to do that now.
 			self.begin = timestamp
-			#NOTE: Debugging.
-			#dprint("We should never get here. timestamp: {timestamp}, window: {begin}::{end}"\
-				#.format(timestamp=timestamp, begin=self._begin, end=self._end))
-			#if not self._begin == self._end and not (self._begin == 0 or self._end == 0):
-				#dprint("Wide time window: timestamp: {timestamp}, window: {begin}::{end}"\
-				#.format(timestamp=timestamp, begin=self._begin, end=self._end)) # Impossible.
 		
 	def addFilledOrder(self, order, timestamp=None):
 		
@@ -195,171 +393,3594 @@ class MarketHistoryTimeWindow(object):
 		elif not self.encompasses(order.timestamp):
 			raise MarketHistoryTimeWindowOrderOutOfBoundsError(\
 				"Tried to add a filled order with timestamp {timestamp}, which is outside our window: {begin}:{end}"\
-					.format(timestamp=order.timestamp, begin=self.begin.timestamp, end=self.end.timestamp))
+					.format(timestamp=order.timestamp, begin=self._begin, end=self._end))
 		self.filledOrders.append(order)
 			
+	def __len__(self):
+		return len(self.filledOrders)
+	
 	def addWindow(self, window, adjust=True):
-		"""Takes another MarketHistoryTimeWindow and adds its .filledOrders to ours."""
-		for filledOrder in window.filledOrders:
-			if adjust:
-				self.addFilledOrder(filledOrder, timestamp=filledOrder.timestamp)
-			else:
-				self.addFilledOrder(filledOrder)
+		"""Takes another MarketHistoryTimeWindow and adds its .filledOrders to ours.
+		If adjust is True, our window is expanded to encompass the other one; otherwise
+		its orders have to fit into our window already."""
+		if len(window) == 0:
+			return
+		if adjust:
+			self.adjust(window._begin)
+			self.adjust(window._end)
+		elif not self.encompasses(window._begin) or not self.encompasses(window._end):
+			# Its window reaches past ours, but its orders might still fit.
+			for filledOrder in window.filledOrders:
+				if not self.encompasses(filledOrder.timestamp):
+					raise MarketHistoryTimeWindowOrderOutOfBoundsError(\
+						"Tried to add a filled order with timestamp {timestamp}, which is outside our window: {begin}:{end}"\
+							.format(timestamp=filledOrder.timestamp, begin=self._begin, end=self._end))
+		self._merge(window)
+	
+	def _merge(self, window):
+		"""Takes over the orders of the window, without looking at any bounds."""
+		self.filledOrders.extend(window.filledOrders)
 		
 	def absorbEncompassedWindows(self, windows):
-		"""Absorbs windows from the specified list until we find a window that falls outside of our time window."""
-		numberOfWindowsAbsorbed = 0
-		for window in windows:
-			try:
-				self.addWindow(window, adjust=False)
-			except:
-				break
-			numberOfWindowsAbsorbed += 1
-		try:
-			return windows[numberOfWindowsAbsorbed:]
-		except IndexError: # We absorbed all of them, so there was nothing left at the next index.
-			return []
+		"""Absorbs windows from the specified list until we find a window that falls outside of our time window.
+		Returns the windows that weren't absorbed."""
+		return windows[self.absorbWindows(windows):]
+	
+	def absorbWindows(self, windows, start=0):
+		"""Absorbs windows from the specified list, beginning at index start, until we find a window
+		that falls outside of our time window, and returns the index of that window (or the length
+		of the list if we absorbed them all).
 		
-#==========================================================
-# API Specific Classes
-#==========================================================
-# These will have to be changed if ever a new API is to be
-# implemented.
-
-class MarketHistory(object):
-	def __init__(self, filledOrdersList):
-		self.filledOrders = [FilledOrder(filledOrder["Timestamp"], filledOrder)\
-			for filledOrder in filledOrdersList]
+		The windows are expected in chronological order and not to overlap, which allows finding
+		the last window to absorb with a binary search on their ends."""
+		if start >= len(windows) or windows[start]._begin < self._begin:
+			return start
+		low = start
+		high = len(windows)
+		while low < high:
+			middle = (low+high) // 2
+			if windows[middle]._end <= self._end:
+				low = middle+1
+			else:
+				high = middle
+		for index in range(start, low):
+			self._merge(windows[index])
+		return low
 	
+	@classmethod
+	def rollUp(cls, windows, seconds):
+		"""Takes a list of time windows in chronological order, such as those of
+		MarketHistory.in1Seconds, and merges them into windows of the specified length in
+		seconds, aligned to the UNIX epoch. Runs in time linear in the number of orders.
+		
+		The first window of each run is used as the merger, so the windows of the list are
+		modified. The bounds of the merged windows are those of their first and last window."""
+		merged = []
+		index = 0
+		while index < len(windows):
+			merger = windows[index]
+			mergerEnd = merger._end
+			# Stretch the merger to the full length of its time window for absorbing, and then
+			# shrink it back to the windows it absorbed.
+			merger._end = nextBoundary(merger._begin, seconds) - 1
+			nextIndex = merger.absorbWindows(windows, index+1)
+			merger._end = windows[nextIndex-1]._end if nextIndex > index+1 else mergerEnd
+			merged.append(merger)
+			index = nextIndex
+		return merged
+
+def _dataFrame(indexName, index, columns):
+	"""A pandas DataFrame of named numpy arrays, indexed by UNIX timestamps as datetime64[s].
+	The arrays are used as they are, rather than copied. pandas is only imported here."""
+	import pandas as pd
+	return pd.DataFrame(columns, index=pd.Index(index.view("datetime64[s]"), name=indexName, copy=False),\
+		copy=False)
+
+def _arrowTable(names, arrays):
+	"""A pyarrow Table of numpy arrays, the first of which are UNIX timestamps, turned into
+	timestamp[s]. Arrow takes numeric arrays without copying them. pyarrow is only imported here."""
+	import pyarrow as pa
+	return pa.Table.from_arrays([pa.array(arrays[0].view("datetime64[s]"))]\
+		+ [pa.array(array) for array in arrays[1:]], names=names)
+
+class TradeColumns(object):
+
+	"""Holds trades as parallel typed arrays (timestamps, prices, amounts, totals, sides),
+	sorted by timestamp, oldest first.
+
+	Slicing returns a TradeColumns object sharing the memory of this one, indexing with an
+	int returns a single Trade. Trades with the same timestamp keep their original order.
+	As the timestamps are sorted, they serve as an index for range queries (see .between).
+
+	Parameters:
+
+		timestamps, prices, amounts, totals, sides (array-likes):
+			One entry per trade. Timestamps are UNIX timestamps in seconds.
+
+		presorted (bool): Default: False
+			If True, the arrays are taken to already be sorted by timestamp and are used as
+			they are, without copying."""
+
+	fields = ("timestamps", "prices", "amounts", "totals", "sides")
+
+	def __init__(self, timestamps, prices, amounts, totals, sides, presorted=False):
+		timestamps = np.asarray(timestamps, dtype=np.int64)
+		prices = np.asarray(prices, dtype=np.float64)
+		amounts = np.asarray(amounts, dtype=np.float64)
+		totals = np.asarray(totals, dtype=np.float64)
+		sides = np.asarray(sides, dtype=np.int8)
+		if not presorted:
+			order = np.argsort(timestamps, kind="stable")
+			timestamps, prices, amounts, totals, sides =\
+				timestamps[order], prices[order], amounts[order], totals[order], sides[order]
+		self.timestamps = timestamps
+		self.prices = prices
+		self.amounts = amounts
+		self.totals = totals
+		self.sides = sides
+		# Arrays with room to grow, of which the attributes above are views, once we've been appended to.
+		self._buffers = None
+
+	def __len__(self):
+		return len(self.timestamps)
+
+	def __getitem__(self, key):
+		if isinstance(key, slice):
+			return TradeColumns(self.timestamps[key], self.prices[key], self.amounts[key],\
+				self.totals[key], self.sides[key], presorted=True)
+		return Trade(int(self.timestamps[key]), float(self.prices[key]), float(self.amounts[key]),\
+			float(self.totals[key]), int(self.sides[key]))
+
+	def __iter__(self):
+		for index in range(0, len(self)):
+			yield self[index]
+
+	def positionsBetween(self, begin=None, end=None):
+		"""Returns the (start, stop) positions of the trades with begin <= timestamp < end,
+		found by binary search. None for begin or end means no limit on that side."""
+		start = 0 if begin is None else int(np.searchsorted(self.timestamps, begin, side="left"))
+		stop = len(self) if end is None else int(np.searchsorted(self.timestamps, end, side="left"))
+		return start, max(start, stop)
+
+	def between(self, begin=None, end=None):
+		"""The trades with begin <= timestamp < end, as TradeColumns sharing our memory."""
+		return self[slice(*self.positionsBetween(begin, end))]
+
 	@property
-	def in1Seconds(self):
-		orders = []
-		orderIndex = 0
-		while orderIndex < len(self.filledOrders):
-			currentSecond = self.filledOrders[orderIndex].data["Timestamp"]
-			currentTimeWindow = MarketHistoryTimeWindow()
-			orders.append(currentTimeWindow)
-			while currentSecond == self.filledOrders[orderIndex].data["Timestamp"]:
-				currentOrder = self.filledOrders[orderIndex]
-				currentTimeWindow.addFilledOrder(order=currentOrder, timestamp=currentOrder.timestamp)
-				orderIndex = orderIndex+1
-				#dprint("index: {0}, len: {1}".format(orderIndex, len(self.filledOrders)))
-				if orderIndex == len(self.filledOrders): # Not quite elegant.
-					break
-		return orders
-	
+	def datetimes(self):
+		"""The timestamps as datetime64[s], sharing their memory."""
+		return self.timestamps.view("datetime64[s]")
+
+	def toDataFrame(self):
+		"""A pandas DataFrame of the trades, with price, amount, total and side columns and a
+		datetime64[s] index named timestamp, all sharing our memory."""
+		return _dataFrame("timestamp", self.timestamps, {"price": self.prices, "amount": self.amounts,\
+			"total": self.totals, "side": self.sides})
+
+	def toArrowTable(self):
+		"""A pyarrow Table of the trades, with timestamp, price, amount, total and side columns,
+		sharing our memory."""
+		return _arrowTable(["timestamp", "price", "amount", "total", "side"],\
+			[self.timestamps, self.prices, self.amounts, self.totals, self.sides])
+
+	def append(self, other):
+		"""Appends the trades of other TradeColumns in place. They mustn't be older than ours.
+		Storage grows geometrically, so appending takes amortized time linear in the new trades.
+		Views made from us before keep seeing the trades they saw."""
+		length = len(self)
+		newLength = length + len(other)
+		if len(other) == 0:
+			return
+		if length > 0 and other.timestamps[0] < self.timestamps[-1]:
+			raise MarketHistoryTimeWindowError("Can't append trades older than the newest one.")
+		if self._buffers is None or len(self._buffers[0]) < newLength:
+			capacity = max(newLength, 2*length, 1024)
+			buffers = []
+			for name in self.fields:
+				buffer = np.empty(capacity, dtype=getattr(self, name).dtype)
+				buffer[:length] = getattr(self, name)
+				buffers.append(buffer)
+			self._buffers = buffers
+		for name, buffer in zip(self.fields, self._buffers):
+			buffer[length:newLength] = getattr(other, name)
+			setattr(self, name, buffer[:newLength])
+
+	def groupBoundaries(self, seconds=1):
+		"""Returns the (starts, stops) index arrays of the runs of trades falling into the same
+		time window of the specified length in seconds, windows being aligned to the UNIX epoch."""
+		_checkInterval(seconds)
+		if len(self.timestamps) == 0:
+			empty = np.empty(0, dtype=np.intp)
+			return empty, empty
+		keys = self.timestamps // seconds
+		starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+		stops = np.append(starts[1:], len(keys))
+		return starts, stops
+
+	def coarserBoundaries(self, starts, seconds):
+		"""Like .groupBoundaries, but derived from the starts of a finer grouping, the interval of
+		which seconds has to be a multiple of. Only looks at one trade per finer window."""
+		if len(starts) == 0:
+			return starts, starts
+		keys = self.timestamps[starts] // seconds
+		coarseStarts = starts[np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))]
+		return coarseStarts, np.append(coarseStarts[1:], len(self.timestamps))
+
+	def windows(self, seconds=1):
+		"""Returns a list of MarketHistoryTimeWindowView objects, one per time window of the
+		specified length in seconds that has trades in it."""
+		return self.windowsAt(*self.groupBoundaries(seconds))
+
+	def windowsAt(self, starts, stops, adapter=None):
+		"""Returns a list of MarketHistoryTimeWindowView objects for the specified boundaries.
+		Their .filledOrders are keyed like the raw trades of the adapter (None for a
+		CryptopiaAdapter)."""
+		begins = self.timestamps[starts].tolist()
+		ends = self.timestamps[stops-1].tolist()
+		return [MarketHistoryTimeWindowView(self, start, stop, begin=begin, end=end, adapter=adapter)\
+			for start, stop, begin, end in zip(starts.tolist(), stops.tolist(), begins, ends)]
+
+	def candles(self, seconds):
+		"""Returns the Candles for time windows of the specified length in seconds, aligned to
+		the UNIX epoch. Windows without trades are left out."""
+		return self.candlesAt(seconds, *self.groupBoundaries(seconds))
+
+	def candlesAt(self, seconds, starts, stops):
+		"""Returns the Candles for the specified boundaries of time windows of seconds length."""
+		if len(starts) == 0:
+			return Candles.empty(seconds)
+		return Candles(\
+			interval=seconds,\
+			begins=floorTimestamp(self.timestamps[starts], seconds),\
+			opens=self.prices[starts],\
+			highs=np.maximum.reduceat(self.prices, starts),\
+			lows=np.minimum.reduceat(self.prices, starts),\
+			closes=self.prices[stops-1],\
+			volumes=np.add.reduceat(self.amounts, starts),\
+			totals=np.add.reduceat(self.totals, starts),\
+			counts=stops-starts)
+
+class Candles(object):
+
+	"""OHLCV candles for time windows of a fixed length, as parallel arrays, oldest first.
+	Slicing returns Candles sharing the memory of these.
+
+	Attributes:
+
+		interval (int): Length of the time windows in seconds.
+		begins: UNIX timestamps of the beginnings of the time windows.
+		opens, highs, lows, closes: Prices.
+		volumes: Sum of the traded amounts.
+		totals: Sum of the trade totals (volume in the quote currency).
+		counts: Number of trades."""
+
+	fields = ("begins", "opens", "highs", "lows", "closes", "volumes", "totals", "counts")
+
+	def __init__(self, interval, begins, opens, highs, lows, closes, volumes, totals, counts):
+		self.interval = interval
+		self.begins = begins
+		self.opens = opens
+		self.highs = highs
+		self.lows = lows
+		self.closes = closes
+		self.volumes = volumes
+		self.totals = totals
+		self.counts = counts
+
+	@classmethod
+	def empty(cls, interval):
+		noPrices = np.empty(0, np.float64)
+		return cls(interval, begins=np.empty(0, np.int64), opens=noPrices, highs=noPrices, lows=noPrices,\
+			closes=noPrices, volumes=noPrices, totals=noPrices, counts=np.empty(0, np.intp))
+
+	def __len__(self):
+		return len(self.begins)
+
+	def __getitem__(self, key):
+		if not isinstance(key, slice):
+			raise TypeError("Candles can only be sliced.")
+		return Candles(self.interval, **{name: getattr(self, name)[key] for name in self.fields})
+
+	def between(self, begin=None, end=None):
+		"""The candles of the time windows overlapping begin <= timestamp < end, as Candles
+		sharing our memory, found by binary search. None means no limit on that side."""
+		if not begin is None and not end is None and end <= begin:
+			return self[0:0]
+		start = 0 if begin is None else int(np.searchsorted(self.begins, begin - self.interval, side="right"))
+		stop = len(self) if end is None else int(np.searchsorted(self.begins, end, side="left"))
+		return self[start:stop]
+
+	# Column names of .toDataFrame and .toArrowTable, by field; the prices as in resample().ohlc.
+	columnNames = {"begins": "begin", "opens": "open", "highs": "high", "lows": "low", "closes": "close",\
+		"volumes": "volume", "totals": "total", "counts": "count"}
+
+	def toDataFrame(self):
+		"""A pandas DataFrame of the candles, with open, high, low, close, volume, total and
+		count columns and a datetime64[s] index named begin, all sharing our memory. It can be
+		used wherever resample().ohlc data is, such as by OhlcGraph."""
+		return _dataFrame("begin", self.begins,\
+			{self.columnNames[name]: getattr(self, name) for name in self.fields[1:]})
+
+	def toArrowTable(self):
+		"""A pyarrow Table of the candles, with a begin column of timestamp[s] and the columns of
+		.toDataFrame, sharing our memory."""
+		return _arrowTable([self.columnNames[name] for name in self.fields],\
+			[getattr(self, name) for name in self.fields])
+
+	def joined(self, other):
+		"""Returns new Candles with the candles of other (of the same interval) after ours."""
+		return Candles(self.interval,\
+			**{name: np.concatenate((getattr(self, name), getattr(other, name))) for name in self.fields})
+
+	def resampled(self, seconds):
+		"""Returns Candles for a longer interval, which has to be a multiple of ours,
+		made from these candles rather than from the trades."""
+		_checkInterval(seconds)
+		if len(self) == 0:
+			return Candles.empty(seconds)
+		keys = self.begins // seconds
+		starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+		stops = np.append(starts[1:], len(keys))
+		return Candles(\
+			interval=seconds,\
+			begins=floorTimestamp(self.begins[starts], seconds),\
+			opens=self.opens[starts],\
+			highs=np.maximum.reduceat(self.highs, starts),\
+			lows=np.minimum.reduceat(self.lows, starts),\
+			closes=self.closes[stops-1],\
+			volumes=np.add.reduceat(self.volumes, starts),\
+			totals=np.add.reduceat(self.totals, starts),\
+			counts=np.add.reduceat(self.counts, starts))
+
+class MarketHistoryTimeWindowView(MarketHistoryTimeWindow):
+
+	"""A time window over a range of TradeColumns.
+	Instead of holding FilledOrder objects, it shares the arrays of the columns it was made from.
+	The window bounds are the timestamps of its first and last trade.
+	The raw trades of .filledOrders are made by the adapter, a CryptopiaAdapter if it's None."""
+
+	def __init__(self, columns, start, stop, begin=0, end=0, adapter=None):
+		super().__init__(begin=begin, end=end)
+		self.columns = columns
+		self.start = start
+		self.stop = stop
+		self.adapter = adapter
+
+	def __len__(self):
+		return self.stop - self.start
+
 	@property
-	def in1Minutes(self):
-		"""Returns the market history as a list of one-minute time windows."""
-		
-		# This method iterates through the list of one-second windows, always declaring a
-		# "merger" window, taking note of the minute its second is associated with,
-		# merging all windows it finds in subsequent iterations ("mergee windows") into that
-		# window, until it encounters a window of which the second is of a different minute.
-		# It then makes that window the new merger window and continues.
-		# 
-		# NOTE: If the data is missing data on the first minute, the first time window
-		# may be an inaccurate representation of that minute of the market.
-		# If this is used to draw candles in a graph, that has to be taken into account.
-		
-		mergedTimeWindows = []
-		unmergedTimeWindows = self.in1Seconds
-		unmergedTimeWindowIndex = 0
-		while unmergedTimeWindowIndex < len(unmergedTimeWindows):
-			currentMergerWindow = unmergedTimeWindows[unmergedTimeWindowIndex]
-			mergedTimeWindows.append(currentMergerWindow)
-			# We could choose either .begin or .end; In the case of .in1Seconds, they're the same.
-			currentMergerMinute = currentMergerWindow.end.minute
-			while True:
-				# Merge subsequent windows until the minute changes.
-				unmergedTimeWindowIndex += 1
-				try:
-					currentMergeeWindow = unmergedTimeWindows[unmergedTimeWindowIndex]
-				except IndexError:
+	def trades(self):
+		"""TradeColumns view on the trades of this window. Doesn't copy."""
+		return self.columns[self.start:self.stop]
+
+	@property
+	def filledOrders(self):
+		"""The trades of this window as FilledOrder objects, created on every access.
+		Only meant for compatibility with code expecting them; prefer .trades."""
+		adapter = self.adapter if not self.adapter is None else CryptopiaAdapter()
+		return [FilledOrder(trade.timestamp, adapter.rawTrade(trade)) for trade in self.trades]
+
+	@filledOrders.setter
+	def filledOrders(self, filledOrders):
+		raise MarketHistoryTimeWindowError("Can't set the filled orders of a view on trade columns.")
+
+	def addFilledOrder(self, order, timestamp=None):
+		raise MarketHistoryTimeWindowError("Can't add filled orders to a view on trade columns.")
+
+	def _merge(self, window):
+		"""Views can only take over the trades of views directly following them on the same
+		columns, which is done by moving our stop."""
+		if not isinstance(window, MarketHistoryTimeWindowView) or not window.columns is self.columns\
+		or not window.start == self.stop:
+			raise MarketHistoryTimeWindowError(\
+				"Views can only be merged with views directly following them on the same columns.")
+		self.stop = window.stop
+
+class RollingCandle(MarketHistoryTimeWindow):
+
+	"""A candle that's being built trade by trade, without keeping the trades.
+	Its time window spans interval seconds, from begin (aligned to the interval) to end."""
+
+	def __init__(self, interval, begin):
+		super().__init__(begin=begin, end=nextBoundary(begin, interval)-1)
+		self.interval = interval
+		self.open = None
+		self.high = None
+		self.low = None
+		self.close = None
+		self.volume = 0.0
+		self.total = 0.0
+		self.count = 0
+
+	def __len__(self):
+		return self.count
+
+	def addTrade(self, price, amount, total=0.0):
+		"""Updates the candle with a trade within its time window."""
+		if self.count == 0:
+			self.open = self.high = self.low = price
+		elif price > self.high:
+			self.high = price
+		elif price < self.low:
+			self.low = price
+		self.close = price
+		self.volume += amount
+		self.total += total
+		self.count += 1
+
+class CandleAggregator(object):
+
+	"""Maintains candles of several intervals at once from a single stream of trades.
+
+	Every trade updates the current candle of each interval in constant time. Once a trade
+	falls past the end of a current candle, that candle is sealed and a new one begun.
+	Trades older than the current candle of an interval came in too late and are only
+	counted (.lateTrades) for that interval.
+
+	Parameters:
+
+		intervals (tuple): Default: (60, 300, 900, 3600)
+			Candle lengths in seconds.
+
+		maxSealed (int or None): Default: 1000
+			How many sealed candles to keep per interval. Older ones are dropped.
+			None keeps all of them.
+
+		onSeal (callable or None): Default: None
+			Called with the interval and the RollingCandle whenever a candle is sealed."""
+
+	def __init__(self, intervals=(60, 300, 900, 3600), maxSealed=1000, onSeal=None):
+		self.intervals = tuple(intervals)
+		self.onSeal = onSeal
+		self.current = {interval: None for interval in self.intervals}
+		self.sealed = {interval: deque(maxlen=maxSealed) for interval in self.intervals}
+		self.lateTrades = {interval: 0 for interval in self.intervals}
+
+	def addTrade(self, timestamp, price, amount, total=0.0):
+		"""Updates the candles with a trade. Trades are expected in chronological order."""
+		for interval in self.intervals:
+			candle = self.current[interval]
+			if candle is None or candle.olderThan(timestamp):
+				if not candle is None:
+					self._seal(interval, candle)
+				candle = RollingCandle(interval, floorTimestamp(timestamp, interval))
+				self.current[interval] = candle
+			elif candle.newerThan(timestamp):
+				self.lateTrades[interval] += 1
+				continue
+			candle.addTrade(price, amount, total)
+
+	def addTrades(self, columns):
+		"""Updates the candles with all trades of the specified TradeColumns."""
+		for timestamp, price, amount, total in zip(columns.timestamps.tolist(), columns.prices.tolist(),\
+		columns.amounts.tolist(), columns.totals.tolist()):
+			self.addTrade(timestamp, price, amount, total)
+
+	def _seal(self, interval, candle):
+		self.sealed[interval].append(candle)
+		if not self.onSeal is None:
+			self.onSeal(interval, candle)
+
+	def flush(self):
+		"""Seals the current candles, for when no more trades are coming."""
+		for interval in self.intervals:
+			if not self.current[interval] is None:
+				self._seal(interval, self.current[interval])
+				self.current[interval] = None
+
+	def candles(self, interval, includeCurrent=True):
+		"""Returns the sealed candles of an interval as Candles, oldest first,
+		followed by the current candle unless includeCurrent is False."""
+		candles = list(self.sealed[interval])
+		if includeCurrent and not self.current[interval] is None:
+			candles.append(self.current[interval])
+		if len(candles) == 0:
+			return Candles.empty(interval)
+		return Candles(interval,\
+			begins=np.array([candle._begin for candle in candles], dtype=np.int64),\
+			opens=np.array([candle.open for candle in candles], dtype=np.float64),\
+			highs=np.array([candle.high for candle in candles], dtype=np.float64),\
+			lows=np.array([candle.low for candle in candles], dtype=np.float64),\
+			closes=np.array([candle.close for candle in candles], dtype=np.float64),\
+			volumes=np.array([candle.volume for candle in candles], dtype=np.float64),\
+			totals=np.array([candle.total for candle in candles], dtype=np.float64),\
+			counts=np.array([candle.count for candle in candles], dtype=np.intp))
+
+class TradeLog(object):
+
+	"""Append-only log of trades on disk, one JSON object per line, oldest first.
+
+	Trades are only ever appended if they're newer than what the log already has, which
+	allows the log to grow past the rolling window of the API it's being fed from.
+
+	Parameters:
+
+		path (str):
+			Path to the log file. It's created upon the first append.
+
+		timestampKey (str): Default: "Timestamp"
+			Key of the UNIX timestamp in the trade dicts."""
+
+	def __init__(self, path, timestampKey="Timestamp"):
+		self.path = path
+		self.timestampKey = timestampKey
+		# Newest timestamp in the log and a count of the trades sharing it, by signature.
+		self._newestTimestamp = None
+		self._newestSignatures = Counter()
+
+	@property
+	def exists(self):
+		return os.path.isfile(self.path) and os.path.getsize(self.path) > 0
+
+	@property
+	def secondsSinceLastModification(self):
+		return time.time() - os.path.getmtime(self.path)
+
+	def touch(self):
+		"""Mark the log as up to date, even if there was nothing new to append."""
+		os.utime(self.path, None)
+
+	@property
+	def newestTimestamp(self):
+		"""Timestamp of the newest logged trade, or None if the log is empty."""
+		if self._newestTimestamp == None and self.exists:
+			self._readNewest()
+		return self._newestTimestamp
+
+	@staticmethod
+	def signature(trade):
+		"""Identifies a trade among those of the same second.
+		Includes the trade ID, if the API provides one."""
+		return tuple(sorted(trade.items()))
+
+	def read(self):
+		"""Returns all trades in the log as a list of dicts, oldest first."""
+		trades = []
+		if self.exists:
+			with open(self.path, "r") as logFile:
+				trades = [json.loads(line) for line in logFile if line.strip()]
+		self._newestTimestamp = None
+		self._remember(trades)
+		return trades
+
+	def _readNewest(self):
+		"""Reads back the trades sharing the newest timestamp from the end of the log,
+		without reading the whole log."""
+		trades = []
+		with open(self.path, "rb") as logFile:
+			position = logFile.seek(0, os.SEEK_END)
+			tail = b""
+			while position > 0:
+				blockSize = min(65536, position)
+				position -= blockSize
+				logFile.seek(position)
+				tail = logFile.read(blockSize) + tail
+				# Unless we're at the beginning of the file, the first line may be cut off.
+				lines = tail.split(b"\n")[0 if position == 0 else 1:]
+				trades = [json.loads(line.decode()) for line in lines if line.strip()]
+				if len(trades) > 0 and trades[0][self.timestampKey] < trades[-1][self.timestampKey]:
 					break
-				currentMergeeMinute = currentMergeeWindow.end.minute
-				if currentMergerMinute == currentMergeeMinute:
-					currentMergerWindow.addWindow(currentMergeeWindow)
+		self._newestTimestamp = None
+		self._remember(trades)
+
+	def _remember(self, trades):
+		"""Takes note of the newest timestamp among the specified trades, which have to be
+		sorted oldest first and be newer than the log, and the signatures of the trades sharing it."""
+		if len(trades) == 0:
+			return
+		newestTimestamp = trades[-1][self.timestampKey]
+		if not newestTimestamp == self._newestTimestamp:
+			self._newestTimestamp = newestTimestamp
+			self._newestSignatures = Counter()
+		for trade in reversed(trades):
+			if not trade[self.timestampKey] == newestTimestamp:
+				break
+			self._newestSignatures[self.signature(trade)] += 1
+
+	def appendNew(self, trades):
+		"""Appends those of the specified trades that aren't in the log yet, and returns them,
+		oldest first. The trades are expected newest first, as GetMarketHistory returns them."""
+		if self._newestTimestamp == None and self.exists:
+			self._readNewest()
+		# Reversing first keeps trades of the same second in chronological order.
+		trades = sorted(reversed(trades), key=lambda trade: trade[self.timestampKey])
+		# Trades of the newest logged second might have been logged already, or not, if
+		# more of them happened after we last fetched. Trades without an ID are only
+		# told apart by their contents, so identical ones are counted rather than dropped.
+		alreadyLogged = Counter(self._newestSignatures)
+		newTrades = []
+		for trade in trades:
+			timestamp = trade[self.timestampKey]
+			if not self._newestTimestamp == None:
+				if timestamp < self._newestTimestamp:
+					continue
+				if timestamp == self._newestTimestamp:
+					signature = self.signature(trade)
+					if alreadyLogged[signature] > 0:
+						alreadyLogged[signature] -= 1
+						continue
+			newTrades.append(trade)
+		if len(newTrades) > 0:
+			with open(self.path, "a") as logFile:
+				logFile.write("".join([json.dumps(trade)+"\n" for trade in newTrades]))
+			self._remember(newTrades)
+		return newTrades
+
+class TradeStore(object):
+
+	"""Append-only store of trades in a binary file of fixed-width records, oldest first.
+
+	The file starts with a header of headerSize bytes (see .headerFormat), followed by
+	tradeRecordDtype records. For reading, the records are memory-mapped, so opening even a
+	large store is instant and .columns() doesn't copy anything.
+
+	A sparse index of the timestamp of every indexStride-th record is kept next to the
+	store (path + ".idx"), which allows finding timestamps while touching only a few pages
+	of the records. It's rebuilt from the records if it's missing or out of date.
+
+	Parameters:
+
+		path (str):
+			Path to the store file. It's created upon the first append.
+
+		indexStride (int): Default: 4096
+			Every how many records the index has an entry. Only used when creating a store."""
+
+	magic = b"SCSTRADE"
+	version = 1
+	# Magic, version, record size, record count, index stride.
+	headerFormat = "<8sIIQI"
+	headerSize = 64
+
+	def __init__(self, path, indexStride=4096):
+		self.path = path
+		self.indexPath = "{0}.idx".format(path)
+		self.indexStride = indexStride
+		self._index = None
+		self._indexedCount = 0
+
+	@property
+	def exists(self):
+		return os.path.isfile(self.path) and os.path.getsize(self.path) >= self.headerSize
+
+	@property
+	def secondsSinceLastModification(self):
+		return time.time() - os.path.getmtime(self.path)
+
+	def touch(self):
+		"""Mark the store as up to date, even if there was nothing new to append."""
+		os.utime(self.path, None)
+
+	def _packHeader(self, count):
+		return struct.pack(self.headerFormat, self.magic, self.version, tradeRecordDtype.itemsize,\
+			count, self.indexStride).ljust(self.headerSize, b"\0")
+
+	def _readHeader(self):
+		"""Returns the record count of the store, and takes over its index stride."""
+		with open(self.path, "rb") as storeFile:
+			header = storeFile.read(self.headerSize)
+		magic, version, recordSize, count, indexStride = struct.unpack_from(self.headerFormat, header)
+		if not magic == self.magic or not version == self.version\
+		or not recordSize == tradeRecordDtype.itemsize:
+			raise TradeStoreError("{path} isn't a trade store of version {version}."\
+				.format(path=self.path, version=self.version))
+		self.indexStride = indexStride
+		return count
+
+	@property
+	def count(self):
+		return self._readHeader() if self.exists else 0
+
+	@property
+	def newestTimestamp(self):
+		"""Timestamp of the newest stored trade, or None if the store is empty."""
+		records = self.records()
+		return int(records["timestamp"][-1]) if len(records) > 0 else None
+
+	def records(self):
+		"""The records of the store as a read-only, memory-mapped structured array."""
+		count = self.count
+		if count == 0:
+			return np.empty(0, dtype=tradeRecordDtype)
+		return np.memmap(self.path, dtype=tradeRecordDtype, mode="r", offset=self.headerSize,\
+			shape=(count,))
+
+	def columns(self):
+		"""The trades of the store as TradeColumns, viewing the memory-mapped records."""
+		records = self.records()
+		return TradeColumns(records["timestamp"], records["price"], records["amount"],\
+			records["total"], records["side"], presorted=True)
+
+	def index(self, records=None):
+		"""The sparse index: Timestamps of the records at multiples of indexStride."""
+		if records is None:
+			records = self.records()
+		expectedLength = -(-len(records) // self.indexStride)
+		if self._index is None or not self._indexedCount == len(records):
+			self._index = None
+			if os.path.isfile(self.indexPath):
+				self._index = np.fromfile(self.indexPath, dtype="<i8")
+			if self._index is None or not len(self._index) == expectedLength:
+				self._index = np.array(records["timestamp"][::self.indexStride])
+				self._index.tofile(self.indexPath)
+			self._indexedCount = len(records)
+		return self._index
+
+	def searchsorted(self, timestamp, side="left", records=None):
+		"""Like numpy.searchsorted on the timestamps of the records, but using the index to
+		only look at the block of records the timestamp has to be in."""
+		if records is None:
+			records = self.records()
+		index = self.index(records)
+		block = np.searchsorted(index, timestamp, side=side)
+		low = max(block-1, 0) * self.indexStride
+		high = min(block * self.indexStride, len(records))
+		return low + int(np.searchsorted(records["timestamp"][low:high], timestamp, side=side))
+
+	def between(self, begin=None, end=None):
+		"""The trades with begin <= timestamp < end as TradeColumns viewing the memory-mapped
+		records. Only the pages of the records around begin and end are touched to find them.
+		None means no limit on that side."""
+		records = self.records()
+		start = 0 if begin is None else self.searchsorted(begin, records=records)
+		stop = len(records) if end is None else self.searchsorted(end, records=records)
+		records = records[start:max(start, stop)]
+		return TradeColumns(records["timestamp"], records["price"], records["amount"],\
+			records["total"], records["side"], presorted=True)
+
+	def append(self, columns):
+		"""Appends TradeColumns, none of which may be older than the newest stored trade."""
+		if len(columns) == 0:
+			return
+		if not self.exists:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			with open(self.path, "wb") as storeFile:
+				storeFile.write(self._packHeader(0))
+		count = self._readHeader()
+		records = np.zeros(len(columns), dtype=tradeRecordDtype)
+		records["timestamp"] = columns.timestamps
+		records["price"] = columns.prices
+		records["amount"] = columns.amounts
+		records["total"] = columns.totals
+		records["side"] = columns.sides
+		with open(self.path, "r+b") as storeFile:
+			storeFile.seek(self.headerSize + count*tradeRecordDtype.itemsize)
+			storeFile.write(records.tobytes())
+			storeFile.flush()
+			# Only count the records once they're written, so an interrupted append
+			# leaves a consistent store behind.
+			storeFile.seek(0)
+			storeFile.write(self._packHeader(count+len(records)))
+		# Extend the index by the new records at multiples of the stride.
+		index = self.index(self.records()[:count])
+		firstIndexed = -(-count // self.indexStride) * self.indexStride
+		newEntries = records["timestamp"][firstIndexed-count::self.indexStride]
+		with open(self.indexPath, "ab") as indexFile:
+			indexFile.write(newEntries.astype("<i8").tobytes())
+		self._index = np.concatenate((index, newEntries))
+		self._indexedCount = count + len(records)
+
+	def appendNew(self, columns):
+		"""Appends those of the specified TradeColumns that aren't in the store yet, and returns
+		them as TradeColumns. Trades are told apart by their contents, so identical trades
+		within the newest stored second are counted rather than dropped."""
+		records = self.records()
+		if len(records) > 0 and len(columns) > 0:
+			newestTimestamp = int(records["timestamp"][-1])
+			newestRecords = records[self.searchsorted(newestTimestamp, records=records):]
+			alreadyStored = Counter(Trade(int(record["timestamp"]), float(record["price"]),\
+				float(record["amount"]), float(record["total"]), int(record["side"]))\
+				for record in newestRecords)
+			keep = columns.timestamps > newestTimestamp
+			for index in np.flatnonzero(columns.timestamps == newestTimestamp).tolist():
+				trade = columns[index]
+				if alreadyStored[trade] > 0:
+					alreadyStored[trade] -= 1
 				else:
-					# The minute changed. Make this window the new merger.
-					currentMergerWindow = currentMergeeWindow
-					break
-		return mergedTimeWindows
+					keep[index] = True
+			columns = TradeColumns(columns.timestamps[keep], columns.prices[keep],\
+				columns.amounts[keep], columns.totals[keep], columns.sides[keep], presorted=True)
+		self.append(columns)
+		return columns
+
+	@staticmethod
+	def unstored(stored, columns):
+		"""Returns a mask of the trades of the TradeColumns columns which aren't among the
+		TradeColumns stored, comparing their contents. Identical trades are counted: With two
+		of a kind stored, only the third and further ones of that kind are unstored."""
+		count = len(stored)
+		sources = np.concatenate((np.zeros(count, dtype=np.int8), np.ones(len(columns), dtype=np.int8)))
+		keys = [np.concatenate((getattr(stored, name), getattr(columns, name))) for name in TradeColumns.fields]
+		# Identical trades end up next to each other, the stored ones first.
+		order = np.lexsort([sources] + keys[::-1])
+		keys = [key[order] for key in keys]
+		differs = np.zeros(len(order), dtype=bool)
+		differs[0:1] = True
+		for key in keys:
+			differs[1:] |= key[1:] != key[:-1]
+		groupStarts = np.flatnonzero(differs)
+		storedCounts = np.add.reduceat(sources[order] == 0, groupStarts) if len(order) > 0 else groupStarts
+		groups = np.cumsum(differs) - 1
+		# Position of every trade among those of its kind, stored ones included.
+		ranks = np.arange(len(order)) - groupStarts[groups]
+		mask = np.empty(len(order), dtype=bool)
+		mask[order] = ranks >= 2*storedCounts[groups]
+		return mask[count:]
+
+	def merge(self, columns):
+		"""Like .appendNew, but takes trades of any age, such as a backfill of older trades,
+		and returns those that weren't in the store yet. Within the timespan the store and the
+		trades have in common, trades are told apart by their contents.
 		
-	def inMinutesDeprecated(self, minutes):
-		# Is not programmed to be robust against leap seconds.
-		mergedWindows = []
-		if 60 % minutes == 0:
-			unmergedTimeWindowIndex = 0
-			unmergedTimeWindows = self.in1Minutes
-			while unmergedTimeWindowIndex < len(unmergedTimeWindows):
-				currentMergerWindow = unmergedTimeWindows[unmergedTimeWindowIndex]
-				mergedWindows.append(currentMergerWindow)
-				counter = 0
-				for minute in range(0, minutes):
-					dprint(minute)
-					unmergedTimeWindowIndex += 1
-					try:
-						currentMergeeWindow = unmergedTimeWindows[unmergedTimeWindowIndex+counter]
-					except IndexError:
-						break
-					# Are we still within the desired time window?
-					try:
-						currentMergerWindow.addWindow(currentMergeeWindow, adjust=False)
-					except MarketHistoryTimeWindowOrderOutOfBoundsError:
-						break
-					counter += 1
-		else:
-			MarketHistoryTimeWindowError(\
-				"A non-divisor of 60 has been specified as a time window: {0}".format(minutes))
-		return mergedWindows
+		Unless all the trades are newer, the store is rewritten: The merged trades are written
+		to a new store next to it, which then replaces it."""
+		records = self.records()
+		if len(records) == 0 or len(columns) == 0 or columns.timestamps[0] >= records["timestamp"][-1]:
+			return self.appendNew(columns)
+		stored = self.columns()
+		overlapBegin = max(int(stored.timestamps[0]), int(columns.timestamps[0]))
+		overlapEnd = min(int(stored.timestamps[-1]), int(columns.timestamps[-1]))
+		if overlapBegin <= overlapEnd:
+			overlapping = stored[self.searchsorted(overlapBegin, records=records)\
+				:self.searchsorted(overlapEnd, side="right", records=records)]
+			within = (columns.timestamps >= overlapBegin) & (columns.timestamps <= overlapEnd)
+			keep = ~within
+			keep[within] = self.unstored(overlapping, columns[int(np.argmax(within)):][:int(within.sum())])
+			columns = TradeColumns(columns.timestamps[keep], columns.prices[keep],\
+				columns.amounts[keep], columns.totals[keep], columns.sides[keep], presorted=True)
+		if len(columns) == 0:
+			return columns
+		# Both are sorted, and the stable sort of TradeColumns merges such runs in linear time.
+		# Stored trades come first among those of the same second.
+		merged = TradeColumns(*[np.concatenate((getattr(stored, name), getattr(columns, name)))\
+			for name in TradeColumns.fields])
+		mergingPath = "{0}.merging".format(self.path)
+		mergingStore = TradeStore(mergingPath, indexStride=self.indexStride)
+		for path in (mergingStore.path, mergingStore.indexPath):
+			if os.path.isfile(path):
+				os.remove(path)
+		mergingStore.append(merged)
+		os.replace(mergingStore.indexPath, self.indexPath)
+		os.replace(mergingStore.path, self.path)
+		self._index = None
+		self._indexedCount = 0
+		return columns
+
+	def mergeRuns(self, runs, blockSize=1024*1024):
+		"""Like .merge, but for trades too many to hold in memory: Takes them as sorted runs
+		of TradeColumns, such as those of other TradeStores, which are memory-mapped, and
+		returns how many of them weren't in the store yet.
 		
-		def inMinutes(self, minutes):
-			pass
-	
-#==========================================================
-class Data(object):
-	
-	#=============================
-	"""Currency data handler for getting and caching data from a web API."""
-	#=============================
-	
-	def __init__(self, address, storePath, updateInterval=defaultUpdateInterval, startFresh=True):
-		self.cacheFile = File(storePath, make=True, makeDirs=True)
-		self.address = address
-		self.updateInterval = updateInterval
-		self.dict = {}
-		self.string = ""
-		if startFresh:
-			self.refresh(noInit=True)
-		self._initData()
-	
-	def _initData(self):
-		"""Initialize the cacheFile data into the various data structures we use, such as .dict."""
-		#NOTE: Could use some error handling in case the file is empty.
-		self.string = self.cacheFile.read()
-		self.dict = json.loads(self.string)
-	
-	def refreshCache(self):
-		"""Refresh the cacheFile with data from the web API."""
-		if self.cacheFile.secondsSinceLastModification > self.updateInterval\
-		or self.cacheFile.read() == "":
-			if self.cacheFile.writable:
-				dprint("Refreshing data.")
-				self.cacheFile.write(urlopen(Request(self.address)).read().decode())
-				dprint("Done refreshing data.")
-	
-	def refresh(self, noInit=False):
-		"""Have the cache file refreshed and re-initialize our data from it."""
-		self.refreshCache()
-		if noInit:
-			self._initData()
+		The runs and the store are merged block by block, each block being the next trades up
+		to a timestamp, about blockSize of them, so only that many are in memory at once. The
+		merged trades are written to a new store next to this one, which then replaces it."""
+		runs = [run for run in runs if len(run) > 0]
+		if len(runs) == 0:
+			return 0
+		sources = [self.columns()] + runs
+		positions = [0] * len(sources)
+		share = max(blockSize // len(sources), 1)
+		mergingPath = "{0}.merging".format(self.path)
+		mergingStore = TradeStore(mergingPath, indexStride=self.indexStride)
+		for path in (mergingStore.path, mergingStore.indexPath):
+			if os.path.isfile(path):
+				os.remove(path)
+		merged = 0
+		while any(position < len(source) for source, position in zip(sources, positions)):
+			# Every source contributes its trades up to the earliest timestamp any of them
+			# reaches within its share of the block, so the sources stay in step.
+			begin = min(int(source.timestamps[position])\
+				for source, position in zip(sources, positions) if position < len(source))
+			ends = [int(source.timestamps[position+share])\
+				for source, position in zip(sources, positions) if position+share < len(source)]
+			# One second might have more trades than a share; it's taken whole then.
+			end = max(min(ends), begin+1) if len(ends) > 0 else None
+			blocks = []
+			for index, source in enumerate(sources):
+				stop = len(source) if end is None\
+					else positions[index] + int(np.searchsorted(source.timestamps[positions[index]:], end))
+				blocks.append(source[positions[index]:stop])
+				positions[index] = stop
+			stored = blocks[0]
+			new = TradeColumns(*[np.concatenate([getattr(block, name) for block in blocks[1:]])\
+				for name in TradeColumns.fields])
+			new = new[0:0] if len(new) == 0 else TradeColumns(*[getattr(new, name)[self.unstored(stored, new)]\
+				for name in TradeColumns.fields], presorted=True)
+			merged += len(new)
+			# Stored trades come first among those of the same second.
+			mergingStore.append(TradeColumns(*[np.concatenate((getattr(stored, name), getattr(new, name)))\
+				for name in TradeColumns.fields]))
+		del sources, blocks, stored
+		if merged == 0:
+			for path in (mergingStore.path, mergingStore.indexPath):
+				if os.path.isfile(path):
+					os.remove(path)
+			return 0
+		os.replace(mergingStore.indexPath, self.indexPath)
+		os.replace(mergingStore.path, self.path)
+		self._index = None
+		self._indexedCount = 0
+		return merged
 
+# A price level of an order book, as stored by OrderBookStore (16 bytes).
+orderLevelDtype = np.dtype([("price", "<f8"), ("amount", "<f8")])
 
+def _orderLevels(levels):
+	"""Turns (price, amount) pairs or orderLevelDtype records into orderLevelDtype records with
+	unique prices, ascending. Amounts of the same price are added up."""
+	if isinstance(levels, np.ndarray) and levels.dtype == orderLevelDtype:
+		prices, amounts = levels["price"], levels["amount"]
+	else:
+		pairs = np.array(levels, dtype=np.float64).reshape(-1, 2)
+		prices, amounts = pairs[:, 0], pairs[:, 1]
+	uniquePrices, inverse = np.unique(prices, return_inverse=True)
+	result = np.empty(len(uniquePrices), dtype=orderLevelDtype)
+	result["price"] = uniquePrices
+	result["amount"] = np.bincount(inverse.ravel(), weights=amounts, minlength=len(uniquePrices))\
+		if not len(uniquePrices) == len(prices) else amounts[np.argsort(prices, kind="stable")]
+	return result
 
-#=======================================================================================
-# Action
-#=======================================================================================
+def _levelChanges(old, new):
+	"""The levels (ascending, unique prices) that differ between two sides of a book, with
+	their new amounts; 0 for levels that are gone."""
+	prices = np.union1d(old["price"], new["price"])
+	oldAmounts = np.zeros(len(prices))
+	oldAmounts[np.searchsorted(prices, old["price"])] = old["amount"]
+	newAmounts = np.zeros(len(prices))
+	newAmounts[np.searchsorted(prices, new["price"])] = new["amount"]
+	changed = oldAmounts != newAmounts
+	changes = np.empty(np.count_nonzero(changed), dtype=orderLevelDtype)
+	changes["price"] = prices[changed]
+	changes["amount"] = newAmounts[changed]
+	return changes
 
-if __name__ == "__main__":
-	pass
+def _withLevelChanges(levels, changes):
+	"""The levels (ascending, unique prices) of a side of a book with changes applied."""
+	prices = np.union1d(levels["price"], changes["price"])
+	amounts = np.zeros(len(prices))
+	amounts[np.searchsorted(prices, levels["price"])] = levels["amount"]
+	amounts[np.searchsorted(prices, changes["price"])] = changes["amount"]
+	kept = amounts != 0
+	result = np.empty(np.count_nonzero(kept), dtype=orderLevelDtype)
+	result["price"] = prices[kept]
+	result["amount"] = amounts[kept]
+	return result
+
+class OrderBook(object):
+
+	"""A snapshot of the order book of a market.
+
+	.bids and .asks are orderLevelDtype records with one entry per price, best first:
+	Bids by descending, asks by ascending price.
+
+	Parameters:
+
+		timestamp (int):
+			UNIX timestamp of the snapshot.
+
+		bids, asks (list or numpy.ndarray):
+			(price, amount) pairs or orderLevelDtype records, in any order."""
+
+	def __init__(self, timestamp, bids, asks):
+		self.timestamp = timestamp
+		self.bids = _orderLevels(bids)[::-1]
+		self.asks = _orderLevels(asks)
+
+	@property
+	def bestBid(self):
+		return float(self.bids["price"][0]) if len(self.bids) > 0 else None
+
+	@property
+	def bestAsk(self):
+		return float(self.asks["price"][0]) if len(self.asks) > 0 else None
+
+	@property
+	def spread(self):
+		if self.bestBid is None or self.bestAsk is None:
+			return None
+		return self.bestAsk - self.bestBid
+
+	@property
+	def mid(self):
+		if self.bestBid is None or self.bestAsk is None:
+			return None
+		return (self.bestAsk + self.bestBid) / 2
+
+	def __eq__(self, other):
+		return isinstance(other, OrderBook) and self.timestamp == other.timestamp\
+			and np.array_equal(self.bids, other.bids) and np.array_equal(self.asks, other.asks)
+
+class OrderBookStore(object):
+
+	"""Append-only store of order book snapshots of a market in a binary file, oldest first.
+
+	Every keyframeInterval seconds, a snapshot is stored in full (a keyframe). In between,
+	only the levels that changed since the previous snapshot are stored (a delta), with an
+	amount of 0 for levels that are gone. As books change little from one snapshot to the
+	next, that's a fraction of the size of full snapshots.
+
+	The file starts with a header of headerSize bytes (see .headerFormat). Every snapshot is
+	a record header (see .recordFormat) followed by orderLevelDtype records of the changed or,
+	for keyframes, all bids and asks. The timestamps, offsets and kinds of the snapshots are
+	kept next to the store (path + ".idx"), so that .at only reads the snapshots from the
+	keyframe before a timestamp up to it. The index is rebuilt from the store if it's missing
+	or out of date.
+
+	Parameters:
+
+		path (str):
+			Path to the store file. It's created upon the first append.
+
+		keyframeInterval (int): Default: 300
+			Seconds between keyframes. The longer, the smaller the store, and the more deltas
+			.at has to apply."""
+
+	magic = b"SCSBOOKS"
+	version = 1
+	# Magic, version, level size.
+	headerFormat = "<8sII"
+	headerSize = 64
+	# Timestamp, whether it's a keyframe, bid and ask level counts.
+	recordFormat = "<q?3xII"
+	recordHeaderSize = struct.calcsize(recordFormat)
+	indexDtype = np.dtype([("timestamp", "<i8"), ("offset", "<i8"), ("keyframe", "?"), ("padding", "V7")])
+
+	def __init__(self, path, keyframeInterval=300):
+		self.path = path
+		self.indexPath = "{0}.idx".format(path)
+		self.keyframeInterval = keyframeInterval
+		self._index = None
+		self._end = None
+		self._newest = None
+
+	@property
+	def exists(self):
+		return os.path.isfile(self.path) and os.path.getsize(self.path) >= self.headerSize
+
+	@property
+	def secondsSinceLastModification(self):
+		return time.time() - os.path.getmtime(self.path)
+
+	def touch(self):
+		os.utime(self.path, None)
+
+	def _checkHeader(self, storeFile):
+		magic, version, levelSize = struct.unpack_from(self.headerFormat, storeFile.read(self.headerSize))
+		if not magic == self.magic or not version == self.version or not levelSize == orderLevelDtype.itemsize:
+			raise OrderBookStoreError("{path} isn't an order book store of version {version}."\
+				.format(path=self.path, version=self.version))
+
+	def _recordSize(self, bidsCount, asksCount):
+		return self.recordHeaderSize + (bidsCount+asksCount) * orderLevelDtype.itemsize
+
+	def index(self):
+		"""The index as indexDtype records, one per snapshot. Snapshots appended by others
+		since the last call are picked up. An incomplete snapshot at the end of the store, left
+		by an interrupted append, is ignored (and overwritten by the next append)."""
+		if not self.exists:
+			self._index = np.empty(0, dtype=self.indexDtype)
+			self._end = self.headerSize
+			return self._index
+		size = os.path.getsize(self.path)
+		with open(self.path, "rb") as storeFile:
+			self._checkHeader(storeFile)
+			if self._index is None:
+				self._loadIndex(storeFile, size)
+			newEntries = []
+			storeFile.seek(self._end)
+			while self._end + self.recordHeaderSize <= size:
+				timestamp, keyframe, bidsCount, asksCount =\
+					struct.unpack(self.recordFormat, storeFile.read(self.recordHeaderSize))
+				recordSize = self._recordSize(bidsCount, asksCount)
+				if self._end + recordSize > size:
+					break
+				newEntries.append((timestamp, self._end, keyframe, b""))
+				self._end += recordSize
+				storeFile.seek(self._end)
+		if len(newEntries) > 0:
+			newEntries = np.array(newEntries, dtype=self.indexDtype)
+			with open(self.indexPath, "ab") as indexFile:
+				indexFile.write(newEntries.tobytes())
+			self._index = np.concatenate((self._index, newEntries))
+			self._newest = None
+		return self._index
+
+	def _loadIndex(self, storeFile, size):
+		"""Reads the index file, dropping the entry of an incomplete snapshot at the end, and
+		finds where the last indexed snapshot ends."""
+		index = np.fromfile(self.indexPath, dtype=self.indexDtype) if os.path.isfile(self.indexPath)\
+			else np.empty(0, dtype=self.indexDtype)
+		loadedLength = len(index)
+		index = index[index["offset"] + self.recordHeaderSize <= size]
+		self._end = self.headerSize
+		if len(index) > 0:
+			lastOffset = int(index["offset"][-1])
+			storeFile.seek(lastOffset)
+			timestamp, keyframe, bidsCount, asksCount =\
+				struct.unpack(self.recordFormat, storeFile.read(self.recordHeaderSize))
+			self._end = lastOffset + self._recordSize(bidsCount, asksCount)
+			if self._end > size:
+				index = index[:-1]
+				self._end = lastOffset
+		if not len(index) == loadedLength:
+			index.tofile(self.indexPath)
+		self._index = index
+
+	@property
+	def count(self):
+		return len(self.index())
+
+	@property
+	def timestamps(self):
+		"""Timestamps of the stored snapshots, oldest first."""
+		return self.index()["timestamp"]
+
+	@property
+	def newestTimestamp(self):
+		index = self.index()
+		return int(index["timestamp"][-1]) if len(index) > 0 else None
+
+	def newest(self):
+		"""The newest stored snapshot as an OrderBook, or None if the store is empty."""
+		index = self.index()
+		if self._newest is None and len(index) > 0:
+			self._newest = self.at(int(index["timestamp"][-1]))
+		return self._newest
+
+	def at(self, timestamp):
+		"""The newest snapshot not newer than timestamp as an OrderBook, or None if there's
+		none. Reads and applies the deltas since the keyframe before it."""
+		index = self.index()
+		position = int(np.searchsorted(index["timestamp"], timestamp, side="right")) - 1
+		if position < 0:
+			return None
+		keyframes = np.flatnonzero(index["keyframe"][:position+1])
+		# The first snapshot is always a keyframe.
+		first = int(keyframes[-1])
+		stop = int(index["offset"][position+1]) if position+1 < len(index) else self._end
+		with open(self.path, "rb") as storeFile:
+			storeFile.seek(int(index["offset"][first]))
+			buffer = storeFile.read(stop - int(index["offset"][first]))
+		bids = asks = None
+		offset = 0
+		while offset < len(buffer):
+			snapshotTimestamp, keyframe, bidsCount, asksCount = struct.unpack_from(self.recordFormat, buffer, offset)
+			offset += self.recordHeaderSize
+			levels = np.frombuffer(buffer, dtype=orderLevelDtype, count=bidsCount+asksCount, offset=offset)
+			offset += levels.nbytes
+			if keyframe:
+				bids, asks = levels[:bidsCount], levels[bidsCount:]
+			else:
+				bids = _withLevelChanges(bids, levels[:bidsCount])
+				asks = _withLevelChanges(asks, levels[bidsCount:])
+		return OrderBook(snapshotTimestamp, bids, asks)
+
+	def append(self, book):
+		"""Appends an OrderBook, which may not be older than the newest stored snapshot.
+		It's stored as a keyframe if keyframeInterval has passed since the last one, or if
+		that's smaller than storing the changes."""
+		index = self.index()
+		if len(index) > 0 and book.timestamp < int(index["timestamp"][-1]):
+			raise OrderBookStoreError("Can't append a snapshot of {timestamp} to {path}, which has newer ones."\
+				.format(timestamp=book.timestamp, path=self.path))
+		bids, asks = book.bids[::-1], book.asks
+		keyframe = True
+		if len(index) > 0:
+			lastKeyframe = int(index["timestamp"][np.flatnonzero(index["keyframe"])[-1]])
+			newest = self.newest()
+			bidChanges = _levelChanges(newest.bids[::-1], bids)
+			askChanges = _levelChanges(newest.asks, asks)
+			if book.timestamp - lastKeyframe < self.keyframeInterval\
+			and len(bidChanges) + len(askChanges) < len(bids) + len(asks):
+				bids, asks = bidChanges, askChanges
+				keyframe = False
+		if not self.exists:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			with open(self.path, "wb") as storeFile:
+				storeFile.write(struct.pack(self.headerFormat, self.magic, self.version, orderLevelDtype.itemsize)\
+					.ljust(self.headerSize, b"\0"))
+			if os.path.isfile(self.indexPath):
+				os.remove(self.indexPath)
+			self._index = np.empty(0, dtype=self.indexDtype)
+			self._end = self.headerSize
+		with open(self.path, "r+b") as storeFile:
+			# Drops what an interrupted append might have left behind.
+			storeFile.truncate(self._end)
+			storeFile.seek(self._end)
+			storeFile.write(struct.pack(self.recordFormat, book.timestamp, keyframe, len(bids), len(asks)))
+			storeFile.write(np.ascontiguousarray(bids).tobytes())
+			storeFile.write(np.ascontiguousarray(asks).tobytes())
+		entry = np.array([(book.timestamp, self._end, keyframe, b"")], dtype=self.indexDtype)
+		with open(self.indexPath, "ab") as indexFile:
+			indexFile.write(entry.tobytes())
+		self._index = np.concatenate((self._index, entry))
+		self._end += self._recordSize(len(bids), len(asks))
+		self._newest = book
+
+class TradeArchive(object):
+
+	"""Long-term archive of trades, partitioned by market and day (UTC), in compressed blocks.
+
+	Every market has a directory with a manifest (manifest.json) and a directory per day,
+	like "NEBL/2018-01-31/", holding the blocks: numpy .npz files of compressed columns, the
+	timestamps delta-encoded. The manifest lists the blocks of the market, oldest first, with
+	their day, first and last timestamp and number of trades, so a query only opens the
+	blocks overlapping its time range. Files not listed in the manifest, like those of an
+	interrupted compaction, are ignored.
+
+	Every .append adds a block per day, which for trades of a refresh are small. .compact
+	merges the blocks of each day into one, which is how days are meant to be kept once
+	they're over. The archive stores the trades it's given as they are; feeding it only new
+	trades (like those of TradeStore.appendNew) is up to the caller. There may be only one
+	writer per market at a time.
+
+	Parameters:
+
+		dirPath (str): Default: os.path.join(defaultMarketscannersDirPath, "archive")
+			Directory of the archive. It's created upon the first append."""
+
+	manifestName = "manifest.json"
+	daySeconds = 86400
+
+	def __init__(self, dirPath=os.path.join(defaultMarketscannersDirPath, "archive")):
+		self.dirPath = dirPath
+
+	def _manifestPath(self, market):
+		return os.path.join(self.dirPath, market, self.manifestName)
+
+	def manifest(self, market):
+		"""The manifest of a market, as a dict with a list of "blocks" oldest first, and the
+		"sequence" number of the next block file."""
+		try:
+			with open(self._manifestPath(market), "r") as manifestFile:
+				return json.load(manifestFile)
+		except FileNotFoundError:
+			return {"blocks": [], "sequence": 0}
+
+	def _writeManifest(self, market, manifest):
+		manifest["blocks"].sort(key=lambda block: (block["begin"], block["sequence"]))
+		path = self._manifestPath(market)
+		with open("{0}.writing".format(path), "w") as manifestFile:
+			json.dump(manifest, manifestFile, indent="\t")
+		os.replace("{0}.writing".format(path), path)
+
+	def markets(self):
+		"""The markets in the archive."""
+		if not os.path.isdir(self.dirPath):
+			return []
+		return sorted(name for name in os.listdir(self.dirPath) if os.path.isfile(self._manifestPath(name)))
+
+	def _dayName(self, timestamp):
+		return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+	def _writeBlock(self, market, manifest, columns):
+		"""Writes TradeColumns of a single day as a block and adds it to the manifest."""
+		day = self._dayName(int(columns.timestamps[0]))
+		fileName = os.path.join(day, "{0}-{1}.npz".format(int(columns.timestamps[0]), manifest["sequence"]))
+		path = os.path.join(self.dirPath, market, fileName)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		# Differences between timestamps are small numbers, which compress far better.
+		np.savez_compressed(path, timestampDeltas=np.diff(columns.timestamps, prepend=0),\
+			prices=columns.prices, amounts=columns.amounts, totals=columns.totals, sides=columns.sides)
+		manifest["blocks"].append({"day": day, "file": fileName, "sequence": manifest["sequence"],\
+			"begin": int(columns.timestamps[0]), "end": int(columns.timestamps[-1]), "count": len(columns)})
+		manifest["sequence"] += 1
+
+	def _readBlock(self, market, block):
+		with np.load(os.path.join(self.dirPath, market, block["file"])) as arrays:
+			return TradeColumns(np.cumsum(arrays["timestampDeltas"]), arrays["prices"], arrays["amounts"],\
+				arrays["totals"], arrays["sides"], presorted=True)
+
+	def _joined(self, columnsList):
+		"""TradeColumns of all trades of a list of TradeColumns, sorted by timestamp. Trades of
+		the same second keep the order of the list. Only sorts if they overlap in time."""
+		if len(columnsList) == 1:
+			return columnsList[0]
+		arrays = [np.concatenate([getattr(columns, name) for columns in columnsList]) for name in TradeColumns.fields]
+		return TradeColumns(*arrays, presorted=len(arrays[0]) < 2 or bool(np.all(arrays[0][1:] >= arrays[0][:-1])))
+
+	def append(self, market, columns):
+		"""Archives TradeColumns of a market, as a new block for every day they span."""
+		if len(columns) == 0:
+			return
+		manifest = self.manifest(market)
+		starts, stops = columns.groupBoundaries(self.daySeconds)
+		for start, stop in zip(starts.tolist(), stops.tolist()):
+			self._writeBlock(market, manifest, columns[start:stop])
+		self._writeManifest(market, manifest)
+
+	def blocks(self, market, begin=None, end=None):
+		"""The manifest entries of the blocks of a market with trades in begin <= timestamp < end.
+		None means no limit on that side."""
+		return [block for block in self.manifest(market)["blocks"]\
+			if (begin is None or block["end"] >= begin) and (end is None or block["begin"] < end)]
+
+	def read(self, market, begin=None, end=None):
+		"""The archived trades of a market with begin <= timestamp < end, as TradeColumns.
+		Only the blocks overlapping the time range are read. None means no limit on that side."""
+		blocks = self.blocks(market, begin, end)
+		if len(blocks) == 0:
+			return TradeColumns([], [], [], [], [], presorted=True)
+		return self._joined([self._readBlock(market, block) for block in blocks]).between(begin, end)
+
+	def compact(self, market, before=None):
+		"""Merges the blocks of every day of a market with more than one block into a single
+		block, for days beginning before the timestamp before (None for all days). Returns how
+		many blocks were merged away."""
+		manifest = self.manifest(market)
+		blocksOfDays = {}
+		for block in manifest["blocks"]:
+			blocksOfDays.setdefault(block["day"], []).append(block)
+		merged = []
+		for day, blocks in sorted(blocksOfDays.items()):
+			dayBegin = floorTimestamp(blocks[0]["begin"], self.daySeconds)
+			if len(blocks) < 2 or (not before is None and dayBegin >= before):
+				continue
+			blocks.sort(key=lambda block: block["sequence"])
+			columns = self._joined([self._readBlock(market, block) for block in blocks])
+			self._writeBlock(market, manifest, columns)
+			merged.extend(blocks)
+		if len(merged) == 0:
+			return 0
+		mergedFiles = set(block["file"] for block in merged)
+		manifest["blocks"] = [block for block in manifest["blocks"] if not block["file"] in mergedFiles]
+		# The manifest goes first, so an interruption leaves unlisted files behind at worst.
+		self._writeManifest(market, manifest)
+		for fileName in mergedFiles:
+			os.remove(os.path.join(self.dirPath, market, fileName))
+		return len(merged) - len(set(block["day"] for block in merged))
+
+	def compactAll(self, before=None):
+		"""Compacts every market, see .compact. Returns how many blocks were merged away."""
+		return sum(self.compact(market, before=before) for market in self.markets())
+
+class ExchangeAdapter(object):
+
+	"""Turns the market history of an exchange into TradeColumns, the normalized form of trades
+	everything from MarketHistory to TradeStore and CandleAggregator works with.
+
+	Raw trades are what the exchange lists, as dicts with the UNIX timestamp under
+	.timestampKey, which is how TradeLog and the legacy mode of MarketHistory keep them.
+	Support for a new exchange means implementing .address, .parseResponse and
+	.tradeColumns in a subclass, and .rawTrade if raw trades aren't keyed like Trade;
+	.streamParser is optional, as are .orderBookAddress and .parseOrderBook, which
+	OrderBookCollector needs."""
+
+	timestampKey = "timestamp"
+	# Whether responses list trades newest first. Streaming downloads rely on this to stop
+	# once they reach trades we have.
+	newestFirst = True
+	# Whether addresses are fetched over HTTP (by MarketsFetcher) rather than opened locally.
+	remote = True
+
+	def address(self, symbol):
+		"""Address of the market history of the market with the specified symbol."""
+		raise NotImplementedError("{0} doesn't implement .address.".format(type(self).__name__))
+
+	def parseResponse(self, response):
+		"""Returns the list of raw trades in a response (str)."""
+		raise NotImplementedError("{0} doesn't implement .parseResponse.".format(type(self).__name__))
+
+	def tradeColumns(self, trades):
+		"""Turns a list of raw trades into TradeColumns."""
+		raise NotImplementedError("{0} doesn't implement .tradeColumns.".format(type(self).__name__))
+
+	def timestamp(self, trade):
+		"""The UNIX timestamp of a raw trade."""
+		return trade[self.timestampKey]
+
+	def rawTrade(self, trade):
+		"""Turns a Trade, as read back from TradeColumns, into a raw trade. By default, that's
+		a dict keyed by the fields of Trade."""
+		return trade._asdict()
+
+	def orderBookAddress(self, symbol):
+		"""Address of the order book of the market with the specified symbol."""
+		raise NotImplementedError("{0} doesn't support order books.".format(type(self).__name__))
+
+	def parseOrderBook(self, response):
+		"""Returns the bids and asks in an order book response (str), as lists of
+		(price, amount) pairs."""
+		raise NotImplementedError("{0} doesn't support order books.".format(type(self).__name__))
+
+	def streamParser(self):
+		"""Returns a new parser with the interface of MarketHistoryStreamParser for parsing
+		responses while they arrive, or None if that isn't supported."""
+		return None
+
+	def open(self, address):
+		"""Opens the address for reading the response as bytes."""
+		from urllib.request import Request, urlopen
+		return urlopen(Request(address))
+
+	def download(self, address):
+		"""Returns the whole response of the address as a str."""
+		response = self.open(address)
+		try:
+			return response.read().decode()
+		finally:
+			response.close()
+
+def _parseBackfillChunk(job):
+	"""Parses the lines of a file between two byte offsets into TradeColumns.
+	Runs in the worker processes of BackfillImporter."""
+	path, start, stop, fileFormat, columnIndices, adapter = job
+	# Building millions of small objects would trigger the garbage collector over and over
+	# for nothing, as none of them are part of cycles.
+	collecting = gc.isenabled()
+	gc.disable()
+	try:
+		return _parseBackfillLines(path, start, stop, fileFormat, columnIndices, adapter)
+	finally:
+		if collecting:
+			gc.enable()
+
+def _parseBackfillLines(path, start, stop, fileFormat, columnIndices, adapter):
+	with open(path, "rb") as dumpFile:
+		dumpFile.seek(start)
+		lines = [line for line in dumpFile.read(stop-start).decode().splitlines() if line.strip()]
+	if fileFormat == "jsonl":
+		return adapter.tradeColumns([json.loads(line) for line in lines])
+	import csv
+	rows = list(csv.reader(lines))
+	count = len(rows)
+	timestamps = np.fromiter((float(row[columnIndices["timestamp"]]) for row in rows), np.float64, count)
+	prices = np.fromiter((row[columnIndices["price"]] for row in rows), np.float64, count)
+	amounts = np.fromiter((row[columnIndices["amount"]] for row in rows), np.float64, count)
+	if "total" in columnIndices:
+		totals = np.fromiter((row[columnIndices["total"]] for row in rows), np.float64, count)
+	else:
+		totals = prices * amounts
+	if "side" in columnIndices:
+		sides = np.fromiter((BackfillImporter.sides.get(row[columnIndices["side"]].strip().lower(), 0)\
+			for row in rows), np.int8, count)
+	else:
+		sides = np.zeros(count, dtype=np.int8)
+	columns = [timestamps.astype(np.int64), prices, amounts, totals, sides]
+	# Dumps listing trades newest first are reversed, which keeps trades of the same
+	# second in chronological order when sorting.
+	if count > 1 and timestamps[0] > timestamps[-1]:
+		columns = [column[::-1] for column in columns]
+	return TradeColumns(*columns)
+
+class BackfillImporter(object):
+
+	"""Imports large dumps of historical trades, parsing chunks of them in parallel.
+
+	The file is split into chunks of about chunkSize bytes at line boundaries, which worker
+	processes parse into TradeColumns. The sorted chunks are then merged. Supported are:
+
+		CSV (.csv): With a header naming the columns timestamp (UNIX timestamp in seconds),
+		price, amount and, optionally, total and side (or type; buy or sell). Case doesn't
+		matter, and further columns are ignored.
+
+		JSON lines (.jsonl, .log): One raw trade of the adapter's exchange per line, as kept
+		by TradeLog.
+
+		JSON (.json): A whole response of the adapter's exchange. This can't be split, so it's
+		parsed by the adapter's stream parser in a single process.
+
+	As files are split at line breaks, quoted CSV fields can't contain any. Files listing
+	trades newest first are recognized by their first and last lines, and their chunks are
+	parsed last to first.
+
+	Parameters:
+
+		adapter (ExchangeAdapter or None): Default: None
+			For parsing JSON. None for a CryptopiaAdapter.
+
+		processes (int or None): Default: None
+			How many worker processes to parse with. None for one per CPU.
+
+		chunkSize (int): Default: 32 MiB
+			About how many bytes of the file to parse per chunk."""
+
+	# Side column values, lower case.
+	sides = {"buy": 1, "sell": -1, "1": 1, "-1": -1, "b": 1, "s": -1}
+	columnAliases = {"type": "side", "time": "timestamp", "date": "timestamp", "volume": "amount",\
+		"quantity": "amount"}
+	requiredColumns = ("timestamp", "price", "amount")
+
+	def __init__(self, adapter=None, processes=None, chunkSize=32*1024*1024):
+		self.adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.processes = processes if not processes is None else os.cpu_count() or 1
+		self.chunkSize = chunkSize
+
+	@staticmethod
+	def fileFormat(path):
+		extension = os.path.splitext(path)[1].lower()
+		if extension == ".csv":
+			return "csv"
+		if extension in (".jsonl", ".log"):
+			return "jsonl"
+		if extension == ".json":
+			return "json"
+		raise ValueError("Don't know how to import {0}: Unknown file extension.".format(path))
+
+	def _readHeader(self, dumpFile):
+		"""Reads the CSV header and returns the column indices by (canonical) name."""
+		import csv
+		names = next(csv.reader([dumpFile.readline().decode()]))
+		columnIndices = {}
+		for index, name in enumerate(names):
+			name = name.strip().lower()
+			name = self.columnAliases.get(name, name)
+			if not name in columnIndices:
+				columnIndices[name] = index
+		for name in self.requiredColumns:
+			if not name in columnIndices:
+				raise ValueError("The CSV header lacks a {0} column.".format(name))
+		return columnIndices
+
+	def chunks(self, path):
+		"""Returns the jobs for _parseBackfillChunk, one per chunk of the file."""
+		fileFormat = self.fileFormat(path)
+		size = os.path.getsize(path)
+		columnIndices = None
+		jobs = []
+		with open(path, "rb") as dumpFile:
+			if fileFormat == "csv":
+				columnIndices = self._readHeader(dumpFile)
+			start = dumpFile.tell()
+			while start < size:
+				# Extend the chunk to the end of the line it ends in.
+				dumpFile.seek(min(start + self.chunkSize, size))
+				dumpFile.readline()
+				stop = min(dumpFile.tell(), size)
+				jobs.append((path, start, stop, fileFormat, columnIndices, self.adapter))
+				start = stop
+		return jobs
+
+	@staticmethod
+	def _newestFirst(jobs):
+		"""Whether the file of the jobs lists trades newest first, judging by its first and
+		last lines (up to edgeSize bytes of them)."""
+		edgeSize = 65536
+		if len(jobs) < 2:
+			return False
+		path, start, stop, fileFormat, columnIndices, adapter = jobs[0]
+		size = jobs[-1][2]
+		edges = []
+		with open(path, "rb") as dumpFile:
+			for edgeStart, edgeStop in ((start, min(start + edgeSize, size)), (max(start, size - edgeSize), size)):
+				# Whole lines only.
+				if edgeStart > start:
+					dumpFile.seek(edgeStart - 1)
+					dumpFile.readline()
+					edgeStart = dumpFile.tell()
+				dumpFile.seek(edgeStop)
+				dumpFile.readline()
+				edges.append((path, edgeStart, min(dumpFile.tell(), size), fileFormat, columnIndices, adapter))
+		first, last = [_parseBackfillChunk(edge) for edge in edges]
+		return len(first) > 0 and len(last) > 0 and first.timestamps[0] > last.timestamps[-1]
+
+	def _parsedChunks(self, path):
+		"""Yields the TradeColumns of the chunks of the file, oldest chunk first if the file
+		lists trades newest first, in the order of the file otherwise."""
+		if self.fileFormat(path) == "json":
+			parser = self.adapter.streamParser()
+			if parser is None:
+				with open(path, "r") as dumpFile:
+					yield self.adapter.tradeColumns(self.adapter.parseResponse(dumpFile.read()))
+				return
+			trades = []
+			with open(path, "rb") as dumpFile:
+				while not parser.done:
+					chunk = dumpFile.read(1024*1024)
+					if chunk == b"":
+						parser.close()
+					trades.extend(parser.feed(chunk))
+			yield self.adapter.tradeColumns(trades)
+			return
+		jobs = self.chunks(path)
+		if self._newestFirst(jobs):
+			jobs.reverse()
+		if len(jobs) <= 1 or self.processes <= 1:
+			for job in jobs:
+				yield _parseBackfillChunk(job)
+			return
+		import multiprocessing
+		with multiprocessing.Pool(min(self.processes, len(jobs))) as pool:
+			for columns in pool.imap(_parseBackfillChunk, jobs):
+				yield columns
+
+	@staticmethod
+	def _merged(chunks):
+		"""Merges sorted TradeColumns. Chunks of a file listing trades newest first come
+		newest first themselves, so they're put in the opposite order then."""
+		chunks = [columns for columns in chunks if len(columns) > 0]
+		if len(chunks) == 0:
+			return TradeColumns([], [], [], [], [])
+		if chunks[0].timestamps[0] > chunks[-1].timestamps[-1]:
+			chunks.reverse()
+		# The stable sort of TradeColumns merges the sorted runs in linear time.
+		return TradeColumns(*[np.concatenate([getattr(columns, name) for columns in chunks])\
+			for name in TradeColumns.fields])
+
+	def read(self, path):
+		"""Returns all trades of the file as TradeColumns, e.g. for a MarketHistory."""
+		return self._merged(self._parsedChunks(path))
+
+	def importInto(self, path, store):
+		"""Adds the trades of the file that aren't in the TradeStore yet to it, and returns
+		how many that were. As long as the chunks are newer than the store, they're appended
+		as they're parsed. From the first one that isn't on, they're written to temporary
+		stores next to it instead, as sorted runs, which are then merged into the store with
+		.mergeRuns. Either way, even huge files don't have to fit in memory at once."""
+		import shutil
+		import tempfile
+		imported = 0
+		runs = []
+		runsDirPath = None
+		try:
+			for columns in self._parsedChunks(path):
+				if len(columns) == 0:
+					continue
+				newestTimestamp = store.newestTimestamp
+				if len(runs) == 0 and (newestTimestamp is None or columns.timestamps[0] >= newestTimestamp):
+					imported += len(store.appendNew(columns))
+					continue
+				if runsDirPath is None:
+					runsDirPath = tempfile.mkdtemp(prefix=".backfill-",\
+						dir=os.path.dirname(os.path.abspath(store.path)))
+				run = TradeStore(os.path.join(runsDirPath, "{0}.trades".format(len(runs))))
+				run.append(columns)
+				runs.append(run)
+			if len(runs) > 0:
+				imported += store.mergeRuns([run.columns() for run in runs],\
+					blockSize=max(self.chunkSize // tradeRecordDtype.itemsize, 1))
+		finally:
+			if not runsDirPath is None:
+				shutil.rmtree(runsDirPath)
+		return imported
+
+#==========================================================
+# Indicators
+#==========================================================
+# Every indicator comes as a function computing it for a
+# whole history of candles at once, and as a class updating
+# it in constant time per new candle. Values are NaN where
+# there isn't enough history yet.
+
+def _rollingSums(values, period):
+	"""Sums of the period values up to and including every index."""
+	sums = np.full(len(values), np.nan)
+	if len(values) >= period:
+		cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+		sums[period-1:] = cumulative[period:] - cumulative[:-period]
+		# Differences of the cumulative sums aren't exactly zero for windows of zeros.
+		nonzero = np.concatenate(([0], np.cumsum(values != 0)))
+		sums[period-1:][nonzero[period:] == nonzero[:-period]] = 0.0
+	return sums
+
+def _exponentialSmoothing(values, alpha, initial):
+	"""Returns e with e[k] = (1-alpha)*e[k-1] + alpha*values[k], where e[-1] is initial.
+
+	The recursion is solved in closed form for blocks of values at a time, as short as
+	it takes for the powers of (1-alpha) involved to stay in a precise range."""
+	values = np.asarray(values, dtype=np.float64)
+	smoothed = np.empty(len(values))
+	decay = 1.0 - alpha
+	if decay <= 0.0:
+		smoothed[:] = values
+		return smoothed
+	blockSize = max(1, int(np.log(1e8) / -np.log(decay)))
+	powers = decay ** np.arange(1, min(blockSize, len(values)) + 1)
+	previous = initial
+	for start in range(0, len(values), blockSize):
+		block = values[start:start+blockSize]
+		blockPowers = powers[:len(block)]
+		smoothed[start:start+len(block)] = blockPowers * (previous + alpha * np.cumsum(block / blockPowers))
+		previous = smoothed[start+len(block)-1]
+	return smoothed
+
+def sma(values, period=20):
+	"""Simple moving average of the last period values."""
+	return _rollingSums(np.asarray(values, dtype=np.float64), period) / period
+
+def ema(values, period=20):
+	"""Exponential moving average with a smoothing factor of 2/(period+1),
+	starting at the first value."""
+	values = np.asarray(values, dtype=np.float64)
+	if len(values) == 0:
+		return np.empty(0)
+	return _exponentialSmoothing(values, 2.0/(period+1), values[0])
+
+def vwap(totals, volumes, period=None):
+	"""Volume weighted average price over the last period candles, or over all of them if
+	period is None. Takes the totals (price times amount) and volumes of the candles."""
+	totals = np.asarray(totals, dtype=np.float64)
+	volumes = np.asarray(volumes, dtype=np.float64)
+	if period is None:
+		totalSums, volumeSums = np.cumsum(totals), np.cumsum(volumes)
+	else:
+		totalSums, volumeSums = _rollingSums(totals, period), _rollingSums(volumes, period)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		return np.where(volumeSums > 0, totalSums / volumeSums, np.nan)
+
+def _wilderAverages(closes, period):
+	"""Wilder's smoothed averages of gains and losses between consecutive closes, as used by
+	the RSI. The first average is the plain mean of the first period gains or losses."""
+	closes = np.asarray(closes, dtype=np.float64)
+	averageGains = np.full(len(closes), np.nan)
+	averageLosses = np.full(len(closes), np.nan)
+	if len(closes) > period:
+		changes = np.diff(closes)
+		gains = np.maximum(changes, 0.0)
+		losses = np.maximum(-changes, 0.0)
+		for averages, moves in ((averageGains, gains), (averageLosses, losses)):
+			averages[period] = moves[:period].mean()
+			averages[period+1:] = _exponentialSmoothing(moves[period:], 1.0/period, averages[period])
+	return averageGains, averageLosses
+
+def _rsiFromAverages(averageGain, averageLoss):
+	# 100 - 100/(1 + gain/loss), without dividing by a loss of zero. No movement at all is 50.
+	with np.errstate(divide="ignore", invalid="ignore"):
+		rsi = 100.0 * averageGain / (averageGain + averageLoss)
+	return np.where((averageGain == 0) & (averageLoss == 0), 50.0, rsi)
+
+def rsi(closes, period=14):
+	"""Relative strength index (Wilder), from 0 to 100."""
+	return _rsiFromAverages(*_wilderAverages(closes, period))
+
+def bollingerBands(values, period=20, deviations=2.0):
+	"""Returns the middle (the simple moving average), upper and lower Bollinger bands, the
+	latter deviations standard deviations (of the last period values) off the middle."""
+	values = np.asarray(values, dtype=np.float64)
+	if len(values) == 0:
+		return np.empty(0), np.empty(0), np.empty(0)
+	# Relative to the first value, to keep the variance from drowning in rounding errors.
+	reference = values[0]
+	shifted = values - reference
+	means = _rollingSums(shifted, period) / period
+	variances = np.maximum(_rollingSums(shifted*shifted, period) / period - means*means, 0.0)
+	middle = means + reference
+	width = deviations * np.sqrt(variances)
+	return middle, middle + width, middle - width
+
+def relativeVolume(volumes, period=20):
+	"""Volume of every candle relative to the average volume of the period candles before
+	it. Volume spikes are where this exceeds some factor, like 3."""
+	volumes = np.asarray(volumes, dtype=np.float64)
+	relative = np.full(len(volumes), np.nan)
+	if len(volumes) > period:
+		with np.errstate(divide="ignore", invalid="ignore"):
+			relative[period:] = volumes[period:] / (_rollingSums(volumes, period)[period-1:-1] / period)
+	return relative
+
+class StreamingIndicator(object):
+
+	"""Base class of the indicators updated one candle at a time.
+
+	.update takes the inputs of the next candle and returns the new value, .peek returns the
+	value the next candle would have, without taking it. Both take constant time.
+	.fromHistory creates an indicator that has seen a whole history already, using the
+	vectorized functions rather than updating candle by candle."""
+
+	# Running sums are recomputed from scratch every so many updates, so rounding errors
+	# don't add up over weeks of updates.
+	resumInterval = 1000
+
+	@classmethod
+	def fromHistory(cls, *inputs, **parameters):
+		indicator = cls(**parameters)
+		if len(inputs[0]) > 0:
+			indicator._prime(*[np.asarray(values, dtype=np.float64) for values in inputs])
+		return indicator
+
+	def _prime(self, *inputs):
+		for values in zip(*[values.tolist() for values in inputs]):
+			self.update(*values)
+
+class _WindowedSum(object):
+	"""Sum of the last period values, kept up to date in constant time. Like _rollingSums,
+	it's exactly zero for windows of zeros, rather than whatever rounding errors are left."""
+
+	def __init__(self, period, resumInterval):
+		self.period = period
+		self.resumInterval = resumInterval
+		self.values = deque(maxlen=period)
+		self.sum = 0.0
+		self.nonzero = 0
+		self._updates = 0
+
+	@property
+	def full(self):
+		return len(self.values) == self.period
+
+	def _nonzeroWith(self, value):
+		return self.nonzero + (value != 0) - (self.full and self.values[0] != 0)
+
+	def sumWith(self, value):
+		"""The sum if value were added."""
+		if self._nonzeroWith(value) == 0:
+			return 0.0
+		return self.sum + value - (self.values[0] if self.full else 0.0)
+
+	def add(self, value):
+		self.sum = self.sumWith(value)
+		self.nonzero = self._nonzeroWith(value)
+		self.values.append(value)
+		self._updates += 1
+		if self._updates >= self.resumInterval:
+			self.sum = float(sum(self.values))
+			self._updates = 0
+
+	def extend(self, values):
+		self.values.extend(values[-self.period:].tolist())
+		self.sum = float(sum(self.values))
+		self.nonzero = sum(1 for value in self.values if value != 0)
+
+class SMA(StreamingIndicator):
+
+	def __init__(self, period=20):
+		self.period = period
+		self._window = _WindowedSum(period, self.resumInterval)
+
+	def _value(self, windowSum, count):
+		return windowSum / self.period if count >= self.period else np.nan
+
+	def peek(self, value):
+		return self._value(self._window.sumWith(value), len(self._window.values) + 1)
+
+	def update(self, value):
+		self._window.add(value)
+		return self._value(self._window.sum, len(self._window.values))
+
+	def _prime(self, values):
+		self._window.extend(values)
+
+class EMA(StreamingIndicator):
+
+	def __init__(self, period=20):
+		self.period = period
+		self.alpha = 2.0/(period+1)
+		self.value = None
+
+	def peek(self, value):
+		return value if self.value is None else (1.0-self.alpha)*self.value + self.alpha*value
+
+	def update(self, value):
+		self.value = self.peek(value)
+		return self.value
+
+	def _prime(self, values):
+		self.value = float(ema(values, self.period)[-1])
+
+class VWAP(StreamingIndicator):
+
+	def __init__(self, period=None):
+		self.period = period
+		if period is None:
+			self._totals, self._volumes = 0.0, 0.0
+		else:
+			self._totals = _WindowedSum(period, self.resumInterval)
+			self._volumes = _WindowedSum(period, self.resumInterval)
+
+	def _value(self, totalSum, volumeSum, count):
+		if (not self.period is None and count < self.period) or volumeSum <= 0:
+			return np.nan
+		return totalSum / volumeSum
+
+	def peek(self, total, volume):
+		if self.period is None:
+			return self._value(self._totals + total, self._volumes + volume, None)
+		return self._value(self._totals.sumWith(total), self._volumes.sumWith(volume),\
+			len(self._totals.values) + 1)
+
+	def update(self, total, volume):
+		if self.period is None:
+			self._totals += total
+			self._volumes += volume
+			return self._value(self._totals, self._volumes, None)
+		self._totals.add(total)
+		self._volumes.add(volume)
+		return self._value(self._totals.sum, self._volumes.sum, len(self._totals.values))
+
+	def _prime(self, totals, volumes):
+		if self.period is None:
+			self._totals, self._volumes = float(totals.sum()), float(volumes.sum())
+		else:
+			self._totals.extend(totals)
+			self._volumes.extend(volumes)
+
+class RSI(StreamingIndicator):
+
+	def __init__(self, period=14):
+		self.period = period
+		self.previousClose = None
+		self.changes = 0
+		# Sums while there are fewer than period changes, averages afterwards.
+		self.gains = 0.0
+		self.losses = 0.0
+
+	def _next(self, close):
+		"""Returns what changes, gains and losses would be after the close."""
+		change = close - self.previousClose
+		gain, loss = max(change, 0.0), max(-change, 0.0)
+		changes = self.changes + 1
+		if changes <= self.period:
+			gains, losses = self.gains + gain, self.losses + loss
+			if changes == self.period:
+				gains, losses = gains / self.period, losses / self.period
+		else:
+			decay = 1.0 - 1.0/self.period
+			gains = decay*self.gains + gain/self.period
+			losses = decay*self.losses + loss/self.period
+		return changes, gains, losses
+
+	def _value(self, changes, gains, losses):
+		if changes < self.period:
+			return np.nan
+		if gains == 0 and losses == 0:
+			return 50.0
+		return 100.0 * gains / (gains + losses)
+
+	def peek(self, close):
+		if self.previousClose is None:
+			return np.nan
+		return self._value(*self._next(close))
+
+	def update(self, close):
+		if self.previousClose is None:
+			self.previousClose = close
+			return np.nan
+		self.changes, self.gains, self.losses = self._next(close)
+		self.previousClose = close
+		return self._value(self.changes, self.gains, self.losses)
+
+	def _prime(self, closes):
+		self.previousClose = float(closes[-1])
+		self.changes = len(closes) - 1
+		if self.changes >= self.period:
+			averageGains, averageLosses = _wilderAverages(closes, self.period)
+			self.gains, self.losses = float(averageGains[-1]), float(averageLosses[-1])
+		else:
+			changes = np.diff(closes)
+			self.gains = float(np.maximum(changes, 0.0).sum())
+			self.losses = float(np.maximum(-changes, 0.0).sum())
+
+class BollingerBands(StreamingIndicator):
+
+	def __init__(self, period=20, deviations=2.0):
+		self.period = period
+		self.deviations = deviations
+		self.reference = None
+		self._window = _WindowedSum(period, self.resumInterval)
+		self._squares = _WindowedSum(period, self.resumInterval)
+
+	def _value(self, reference, windowSum, squaresSum, count):
+		if count < self.period:
+			return np.nan, np.nan, np.nan
+		mean = windowSum / self.period
+		width = self.deviations * max(squaresSum / self.period - mean*mean, 0.0) ** 0.5
+		middle = mean + reference
+		return middle, middle + width, middle - width
+
+	def peek(self, value):
+		reference = value if self.reference is None else self.reference
+		shifted = value - reference
+		return self._value(reference, self._window.sumWith(shifted), self._squares.sumWith(shifted*shifted),\
+			len(self._window.values) + 1)
+
+	def update(self, value):
+		if self.reference is None:
+			self.reference = value
+		shifted = value - self.reference
+		self._window.add(shifted)
+		self._squares.add(shifted*shifted)
+		return self._value(self.reference, self._window.sum, self._squares.sum, len(self._window.values))
+
+	def _prime(self, values):
+		self.reference = float(values[0])
+		shifted = values - self.reference
+		self._window.extend(shifted)
+		self._squares.extend(shifted*shifted)
+
+class RelativeVolume(StreamingIndicator):
+
+	def __init__(self, period=20):
+		self.period = period
+		self._window = _WindowedSum(period, self.resumInterval)
+
+	def peek(self, volume):
+		if not self._window.full:
+			return np.nan
+		average = self._window.sum / self.period
+		if average == 0:
+			return np.inf if volume > 0 else np.nan
+		return volume / average
+
+	def update(self, volume):
+		relative = self.peek(volume)
+		self._window.add(volume)
+		return relative
+
+	def _prime(self, volumes):
+		self._window.extend(volumes)
+
+# An indicator's function, streaming class, and the fields of Candles they take.
+IndicatorSpec = namedtuple("IndicatorSpec", ["function", "streaming", "fields"])
+
+indicators = {
+	"sma": IndicatorSpec(sma, SMA, ("closes",)),
+	"ema": IndicatorSpec(ema, EMA, ("closes",)),
+	"vwap": IndicatorSpec(vwap, VWAP, ("totals", "volumes")),
+	"rsi": IndicatorSpec(rsi, RSI, ("closes",)),
+	"bollingerBands": IndicatorSpec(bollingerBands, BollingerBands, ("closes",)),
+	"relativeVolume": IndicatorSpec(relativeVolume, RelativeVolume, ("volumes",)),
+}
+
+class IndicatorCache(object):
+
+	"""Indicator values of the candles of many markets and intervals, each computed once.
+
+	Meant to be shared by everything looking at indicators, rather than each of them
+	computing their own: SignalScanner keeps one across scans, and the charts of the Gui one
+	for all their markets. Asking again for the same indicator of candles that
+	have grown since, such as those of an extended MarketHistory, only computes the new
+	candles, with the streaming form of the indicator. The newest candle may have changed
+	since; it's always recomputed. Otherwise, the whole history is computed with the
+	vectorized function. That includes candles having been dropped at the beginning, like
+	those of a CandleAggregator with maxSealed do, as the values depend on the history
+	they start with; they're the same either way."""
+
+	def __init__(self):
+		# By (market, interval, indicator name, parameters): [begins, values, streaming indicator].
+		# The streaming indicator has seen all but the newest candle.
+		self._entries = {}
+
+	def get(self, market, candles, name, **parameters):
+		"""Returns the values of the named indicator (see indicators) for the Candles, as an
+		array, or a tuple of arrays for indicators with several values per candle.
+		market is any hashable telling apart the markets of the candles."""
+		spec = indicators[name]
+		key = (market, candles.interval, name, tuple(sorted(parameters.items())))
+		inputs = [getattr(candles, field) for field in spec.fields]
+		entry = self._entries.get(key)
+		values = None
+		if not entry is None:
+			values = self._extended(entry, candles, inputs)
+		if values is None:
+			values = spec.function(*inputs, **parameters)
+			values = values if isinstance(values, tuple) else (values,)
+			entry = [None, None, spec.streaming.fromHistory(*[column[:-1] for column in inputs], **parameters)]
+			self._entries[key] = entry
+		entry[0] = np.array(candles.begins)
+		entry[1] = values
+		return values if len(values) > 1 else values[0]
+
+	def _extended(self, entry, candles, inputs):
+		"""Values for candles continuing those of the entry, or None if they don't."""
+		begins, values, streaming = entry
+		if len(candles) == 0 or len(begins) == 0:
+			return None
+		# The candles the streaming indicator has seen have to be there from the beginning,
+		# and mustn't have changed in between.
+		seen = len(begins) - 1
+		if len(candles) <= seen or not np.array_equal(begins[:seen], candles.begins[:seen]):
+			return None
+		newInputs = [column[seen:].tolist() for column in inputs]
+		updates = [streaming.update(*candleInputs) for candleInputs in zip(*[column[:-1] for column in newInputs])]
+		newest = streaming.peek(*[column[-1] for column in newInputs])
+		if not isinstance(newest, tuple):
+			updates, newest = [(update,) for update in updates], (newest,)
+		newValues = np.array(updates + [newest], dtype=np.float64).reshape(-1, len(newest))
+		return tuple(np.concatenate((old[:seen], new)) for old, new in zip(values, newValues.T))
+
+class CandleIndicators(object):
+
+	"""The indicators of the Candles of one market. Calling it with the name of an indicator
+	(see indicators) and its parameters returns what IndicatorCache.get does for the candles,
+	from the cache if there is one, computed with the vectorized function otherwise."""
+
+	def __init__(self, candles, cache=None, market=None):
+		self.candles = candles
+		self.cache = cache
+		self.market = market
+
+	def __call__(self, name, **parameters):
+		if self.cache is None:
+			spec = indicators[name]
+			return spec.function(*[getattr(self.candles, field) for field in spec.fields], **parameters)
+		return self.cache.get(self.market, self.candles, name, **parameters)
+
+#==========================================================
+# Signals
+#==========================================================
+
+class SignalRule(object):
+
+	"""A condition on the candles of a market, checked for the newest candle.
+
+	Calling a rule with Candles returns a score if the condition is met, None otherwise.
+	Higher scores are stronger signals; they're only compared among hits of the same rule.
+	Rules take their indicators from the CandleIndicators passed along with the candles, so
+	that SignalScanner can have them computed only once, for all its rules and scans.
+	Any callable taking just the candles works as a rule for SignalScanner too, as long as
+	it can be pickled for the worker processes (module level functions can, lambdas can't)."""
+
+	@property
+	def name(self):
+		return type(self).__name__
+
+	def __call__(self, candles, indicators=None):
+		raise NotImplementedError("{0} doesn't implement __call__.".format(self.name))
+
+class PriceBreakout(SignalRule):
+
+	"""The newest close is above the highest high of the lookback candles before it (by more
+	than margin, relative). Scores by how far above it is, relative."""
+
+	def __init__(self, lookback=20, margin=0.0):
+		self.lookback = lookback
+		self.margin = margin
+
+	def __call__(self, candles, indicators=None):
+		if len(candles) <= self.lookback:
+			return None
+		previousHigh = float(candles.highs[-self.lookback-1:-1].max())
+		close = float(candles.closes[-1])
+		if previousHigh <= 0 or close <= previousHigh * (1.0 + self.margin):
+			return None
+		return close / previousHigh - 1.0
+
+class VolumeMultiple(SignalRule):
+
+	"""The volume of the newest candle is at least factor times the average volume of the
+	period candles before it. Scores by the multiple."""
+
+	def __init__(self, period=20, factor=3.0):
+		self.period = period
+		self.factor = factor
+
+	def __call__(self, candles, indicators=None):
+		if len(candles) <= self.period:
+			return None
+		indicators = indicators if not indicators is None else CandleIndicators(candles)
+		multiple = float(indicators("relativeVolume", period=self.period)[-1])
+		if not multiple >= self.factor: # NaN for no volume at all.
+			return None
+		return multiple
+
+class RsiExtreme(SignalRule):
+
+	"""The RSI of the newest candle is below oversold or above overbought. Scores by how far
+	beyond the threshold it is."""
+
+	def __init__(self, period=14, oversold=30.0, overbought=70.0):
+		self.period = period
+		self.oversold = oversold
+		self.overbought = overbought
+
+	def __call__(self, candles, indicators=None):
+		if len(candles) <= self.period:
+			return None
+		indicators = indicators if not indicators is None else CandleIndicators(candles)
+		value = float(indicators("rsi", period=self.period)[-1])
+		if value < self.oversold:
+			return self.oversold - value
+		if value > self.overbought:
+			return value - self.overbought
+		return None
+
+# A rule met by the newest candle of a market.
+SignalHit = namedtuple("SignalHit", ["market", "rule", "score", "begin", "close"])
+
+# Set up in every worker process of SignalScanner by _initSignalWorker.
+_signalWorker = {}
+
+def _sharedCandleArrays(buffer, count):
+	"""The integer (begins, counts) and float (the other fields of Candles) arrays of count
+	candles in a buffer laid out by SignalScanner."""
+	integers = np.ndarray((2, count), dtype=np.int64, buffer=buffer)
+	floats = np.ndarray((len(Candles.fields)-2, count), dtype=np.float64, buffer=buffer, offset=integers.nbytes)
+	return integers, floats
+
+def _sharedCandles(integers, floats, interval, start, stop):
+	return Candles(interval, integers[0, start:stop], *floats[:, start:stop], integers[1, start:stop])
+
+def _initSignalWorker(memoryName, count, offsets, interval, rules):
+	from multiprocessing import shared_memory, util
+	memory = shared_memory.SharedMemory(name=memoryName)
+	_signalWorker["memory"] = memory
+	_signalWorker["arrays"] = _sharedCandleArrays(memory.buf, count)
+	_signalWorker["offsets"] = offsets
+	_signalWorker["interval"] = interval
+	_signalWorker["rules"] = rules
+	_signalWorker["indicatorCache"] = IndicatorCache()
+	# Run as the worker exits. atexit handlers aren't, as workers end with os._exit.
+	util.Finalize(None, _closeSignalWorker, exitpriority=10)
+
+def _closeSignalWorker():
+	"""Detaches a worker process of SignalScanner from the shared memory."""
+	memory = _signalWorker.pop("memory", None)
+	# Nothing may be viewing the memory anymore when it's closed.
+	_signalWorker.clear()
+	if not memory is None:
+		memory.close()
+
+def _checkRules(rules, candlesOfMarkets, indicatorCache=None, markets=None):
+	"""Returns (market index, rule index, score) of every hit among (market index, Candles).
+	Indicators are taken from the IndicatorCache, if any, in which the markets are told apart
+	by their entry in markets, or their index if that's None."""
+	hits = []
+	for market, candles in candlesOfMarkets:
+		if len(candles) == 0:
+			continue
+		indicators = CandleIndicators(candles, indicatorCache, market if markets is None else markets[market])
+		for ruleIndex, rule in enumerate(rules):
+			score = rule(candles, indicators) if isinstance(rule, SignalRule) else rule(candles)
+			if not score is None and score == score: # Not NaN.
+				hits.append((market, ruleIndex, float(score)))
+	return hits
+
+def _checkSharedMarkets(marketRange):
+	"""Runs in the worker processes of SignalScanner, on the candles in shared memory."""
+	integers, floats = _signalWorker["arrays"]
+	offsets = _signalWorker["offsets"]
+	return _checkRules(_signalWorker["rules"], ((market, _sharedCandles(integers, floats,\
+		_signalWorker["interval"], offsets[market], offsets[market+1])) for market in range(*marketRange)),\
+		_signalWorker["indicatorCache"])
+
+class SignalScanner(object):
+
+	"""Checks rules (see SignalRule) against the candles of many markets, and ranks the hits.
+
+	The candles of all markets are copied into a single block of shared memory, once per
+	scan, which the worker processes read directly; only market ranges and hits travel
+	between processes. With a single process, or few candles, the rules are checked right
+	here, which is faster than starting workers.
+
+	The indicators of the rules are computed once per market and shared by all rules. When
+	scanning right here, they're kept in indicatorCache across scans, so the candles of a
+	market that have grown since the last scan only cost computing the new ones. Worker
+	processes only keep them for the scan they're started for.
+
+	Parameters:
+
+		rules (list):
+			The rules to check, see SignalRule.
+
+		processes (int or None): Default: None
+			How many worker processes to use. None for one per CPU.
+
+		minimumParallelCandles (int): Default: 200000
+			Scans over fewer candles than this are done in a single process.
+
+		indicatorCache (IndicatorCache or None): Default: None
+			Where the indicators are kept, e.g. one shared with charts. None for a new one."""
+
+	def __init__(self, rules, processes=None, minimumParallelCandles=200000, indicatorCache=None):
+		self.rules = list(rules)
+		self.processes = processes if not processes is None else os.cpu_count() or 1
+		self.minimumParallelCandles = minimumParallelCandles
+		self.indicatorCache = indicatorCache if not indicatorCache is None else IndicatorCache()
+
+	def _ruleName(self, rule):
+		return getattr(rule, "name", None) or getattr(rule, "__name__", repr(rule))
+
+	def scan(self, candlesOfMarkets):
+		"""Takes a dict of Candles (all of the same interval) by market, and returns a list of
+		SignalHits: Those of the first rule first, then those of the second rule and so on,
+		each ranked by score, highest first."""
+		markets = list(candlesOfMarkets)
+		allCandles = [candlesOfMarkets[market] for market in markets]
+		count = sum(len(candles) for candles in allCandles)
+		if self.processes <= 1 or count < self.minimumParallelCandles or len(markets) < 2:
+			hits = _checkRules(self.rules, enumerate(allCandles), self.indicatorCache, markets)
+		else:
+			hits = self._scanInParallel(allCandles, count)
+		hits.sort(key=lambda hit: (hit[1], -hit[2]))
+		return [SignalHit(markets[market], self._ruleName(self.rules[ruleIndex]), score,\
+			int(allCandles[market].begins[-1]), float(allCandles[market].closes[-1]))\
+			for market, ruleIndex, score in hits]
+
+	def _scanInParallel(self, allCandles, count):
+		import multiprocessing
+		from multiprocessing import shared_memory
+		offsets = np.concatenate(([0], np.cumsum([len(candles) for candles in allCandles]))).tolist()
+		memory = shared_memory.SharedMemory(create=True, size=max(count * 8 * len(Candles.fields), 1))
+		try:
+			integers, floats = _sharedCandleArrays(memory.buf, count)
+			for market, candles in enumerate(allCandles):
+				start, stop = offsets[market], offsets[market+1]
+				integers[0, start:stop] = candles.begins
+				integers[1, start:stop] = candles.counts
+				for row, name in enumerate(Candles.fields[1:-1]):
+					floats[row, start:stop] = getattr(candles, name)
+			# The numpy views have to go before the memory can be closed.
+			del integers, floats
+			# A few ranges per process, so the work evens out.
+			bounds = np.linspace(0, len(allCandles), min(self.processes*4, len(allCandles)) + 1).astype(int).tolist()
+			with multiprocessing.Pool(self.processes, _initSignalWorker,\
+			(memory.name, count, offsets, allCandles[0].interval, self.rules)) as pool:
+				hits = [hit for hits in pool.map(_checkSharedMarkets, list(zip(bounds[:-1], bounds[1:])))\
+					for hit in hits]
+				# Rather than having them terminated on leaving the with block, let the workers
+				# exit, so that they detach from the memory.
+				pool.close()
+				pool.join()
+				return hits
+		finally:
+			memory.close()
+			memory.unlink()
+
+	def scanStores(self, datas, interval, candlesCount=200):
+		"""Scans the last candlesCount candles of interval seconds of the TradeStores of Data
+		objects in binary mode, given as a dict by market. Only the trades of those candles
+		are read from the stores."""
+		candlesOfMarkets = {}
+		for market, data in datas.items():
+			store = data.tradeStore
+			records = store.records()
+			if len(records) == 0:
+				continue
+			since = floorTimestamp(int(records["timestamp"][-1]), interval) - interval*(candlesCount-1)
+			records = records[store.searchsorted(since, records=records):]
+			candlesOfMarkets[market] = TradeColumns(records["timestamp"], records["price"], records["amount"],\
+				records["total"], records["side"], presorted=True).candles(interval)
+		return self.scan(candlesOfMarkets)
+
+#==========================================================
+# API Specific Classes
+#==========================================================
+# These will have to be changed if ever a new API is to be
+# implemented.
+
+class MarketHistory(object):
+
+	"""The market history as returned by the GetMarketHistory API call.
+
+	Parameters:
+
+		filledOrdersList (list or TradeColumns):
+			The "Data" list of the API response, or raw trades of the adapter's exchange.
+			TradeColumns, such as those of a TradeStore, are taken as they are in columnar mode.
+
+		columnar (bool): Default: True
+			If True, the trades are kept in TradeColumns (.columns) and the time window
+			properties return MarketHistoryTimeWindowView objects sharing their arrays.
+			If False, every trade is wrapped in a FilledOrder object (.filledOrders).
+
+		adapter (ExchangeAdapter or None): Default: None
+			What the raw trades are read with. None for a CryptopiaAdapter.
+
+	In columnar mode, the boundaries, time windows and candles of every interval are computed
+	once and cached. Longer intervals are derived from the cached results of the longest
+	cached interval they're a multiple of; five-minute candles from one-minute candles, for
+	example. Trades added through .extend update the caches rather than discarding them.
+	TradeColumns passed in are shared rather than copied, until trades are added; then,
+	they're copied once, so that they aren't changed behind the back of whoever passed them."""
+
+	def __init__(self, filledOrdersList, columnar=True, adapter=None):
+		self.adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.columns = None
+		self._filledOrders = []
+		# Whether .columns are ours to append to, rather than someone else's.
+		self._ownsColumns = True
+		if columnar:
+			if isinstance(filledOrdersList, TradeColumns):
+				self.columns = filledOrdersList
+				self._ownsColumns = False
+			else:
+				self.columns = self.adapter.tradeColumns(filledOrdersList)
+		else:
+			self._filledOrders = [FilledOrder(self.adapter.timestamp(filledOrder), filledOrder)\
+				for filledOrder in filledOrdersList]
+		self.invalidate()
+
+	def invalidate(self):
+		"""Discards all cached boundaries, time windows and candles."""
+		self._boundariesCache = {}
+		self._windowsCache = {}
+		self._candlesCache = {}
+
+	def _finerCached(self, cache, seconds):
+		"""Returns the longest interval in the cache that seconds is a multiple of, or None."""
+		finer = [interval for interval in cache if interval < seconds and seconds % interval == 0]
+		return max(finer) if len(finer) > 0 else None
+
+	def _boundaries(self, seconds):
+		"""Cached (starts, stops) of the time windows of the specified length."""
+		if not seconds in self._boundariesCache:
+			finer = self._finerCached(self._boundariesCache, seconds)
+			with metrics.timing("history.boundaries.seconds") as timing:
+				if finer is None:
+					self._boundariesCache[seconds] = self.columns.groupBoundaries(seconds)
+				else:
+					self._boundariesCache[seconds] =\
+						self.columns.coarserBoundaries(self._boundariesCache[finer][0], seconds)
+			if metrics.enabled:
+				starts, stops = self._boundariesCache[seconds]
+				metrics.observe("history.boundaries.bytes", starts.nbytes + stops.nbytes)
+				if finer is None and timing.seconds > 0:
+					metrics.observe("history.boundaries.tradesPerSecond", len(self.columns) / timing.seconds)
+		return self._boundariesCache[seconds]
+
+	def _windows(self, seconds):
+		"""Cached time windows of the specified length, in a list of their own every time, as
+		callers, such as MarketHistoryTimeWindow.rollUp, may change it."""
+		if not seconds in self._windowsCache:
+			boundaries = self._boundaries(seconds)
+			with metrics.timing("history.windows.seconds"):
+				self._windowsCache[seconds] = self.columns.windowsAt(*boundaries, adapter=self.adapter)
+			metrics.count("history.windows.produced", len(self._windowsCache[seconds]))
+		return list(self._windowsCache[seconds])
+
+	def _candles(self, seconds):
+		"""Cached candles of the specified length."""
+		if not seconds in self._candlesCache:
+			finer = self._finerCached(self._candlesCache, seconds)
+			boundaries = self._boundaries(seconds) if finer is None else None
+			with metrics.timing("history.candles.seconds"):
+				if finer is None:
+					self._candlesCache[seconds] = self.columns.candlesAt(seconds, *boundaries)
+				else:
+					self._candlesCache[seconds] = self._candlesCache[finer].resampled(seconds)
+			if metrics.enabled:
+				candles = self._candlesCache[seconds]
+				metrics.count("history.candles.produced", len(candles))
+				metrics.observe("history.candles.bytes", sum(getattr(candles, name).nbytes for name in Candles.fields))
+		return self._candlesCache[seconds]
+
+	def extend(self, filledOrdersList):
+		"""Adds trades (a "Data" list or TradeColumns) to the market history.
+		
+		If none of them are older than the newest trade we have, they're appended in place
+		and only the last time window of every cached interval, which they might belong to,
+		is recomputed, along with the new ones. Otherwise, the caches are discarded."""
+		if not self.columnar:
+			self._filledOrders.extend([FilledOrder(self.adapter.timestamp(filledOrder), filledOrder)\
+				for filledOrder in filledOrdersList])
+			return
+		if not isinstance(filledOrdersList, TradeColumns):
+			filledOrdersList = self.adapter.tradeColumns(filledOrdersList)
+		if len(filledOrdersList) == 0:
+			return
+		if len(self.columns) > 0 and filledOrdersList.timestamps[0] < self.columns.timestamps[-1]:
+			columns = self.columns
+			self.columns = TradeColumns(*[np.concatenate((getattr(columns, name),\
+				getattr(filledOrdersList, name))) for name in TradeColumns.fields])
+			self._ownsColumns = True
+			self.invalidate()
+			return
+		if not self._ownsColumns:
+			# A view without room to grow, which appending copies into arrays of its own.
+			# The cached windows are on the old columns, and views only merge on the same ones.
+			self.columns = self.columns[0:len(self.columns)]
+			self._ownsColumns = True
+			self._windowsCache = {}
+		self.columns.append(filledOrdersList)
+		for seconds, (starts, stops) in list(self._boundariesCache.items()):
+			# Everything from the start of the last window on might have changed.
+			first = int(starts[-1]) if len(starts) > 0 else 0
+			tail = self.columns[first:]
+			tailStarts, tailStops = tail.groupBoundaries(seconds)
+			tailStarts += first
+			tailStops += first
+			self._boundariesCache[seconds] =\
+				(np.concatenate((starts[:-1], tailStarts)), np.concatenate((stops[:-1], tailStops)))
+			if seconds in self._candlesCache:
+				self._candlesCache[seconds] = self._candlesCache[seconds][:-1]\
+					.joined(self.columns.candlesAt(seconds, tailStarts, tailStops))
+			if seconds in self._windowsCache:
+				windows = self._windowsCache[seconds]
+				del windows[-1:]
+				windows.extend(self.columns.windowsAt(tailStarts, tailStops, adapter=self.adapter))
+		# Candles derived from other candles rather than cached boundaries.
+		for seconds in list(self._candlesCache):
+			if not seconds in self._boundariesCache:
+				del self._candlesCache[seconds]
+
+	@staticmethod
+	def tradeColumnsFromList(filledOrdersList):
+		"""Turns the "Data" list of a GetMarketHistory response into TradeColumns."""
+		return CryptopiaAdapter().tradeColumns(filledOrdersList)
+
+	@property
+	def columnar(self):
+		return not self.columns is None
+
+	@property
+	def filledOrders(self):
+		"""List of FilledOrder objects. In columnar mode, they're created on every access, with
+		raw trades made by the adapter from .columns."""
+		if self.columnar:
+			return [FilledOrder(trade.timestamp, self.adapter.rawTrade(trade)) for trade in self.columns]
+		return self._filledOrders
+
+	@filledOrders.setter
+	def filledOrders(self, filledOrders):
+		"""In columnar mode, .columns are rebuilt from the raw trades of the filled orders."""
+		if self.columnar:
+			self.columns = self.adapter.tradeColumns([filledOrder.data for filledOrder in filledOrders])
+			self._ownsColumns = True
+			self.invalidate()
+			return
+		self._filledOrders = filledOrders
+
+	@property
+	def in1Seconds(self):
+		if self.columnar:
+			return self._windows(1)
+		orders = []
+		orderIndex = 0
+		while orderIndex < len(self.filledOrders):
+			currentSecond = self.filledOrders[orderIndex].timestamp
+			currentTimeWindow = MarketHistoryTimeWindow()
+			orders.append(currentTimeWindow)
+			while currentSecond == self.filledOrders[orderIndex].timestamp:
+				currentOrder = self.filledOrders[orderIndex]
+				currentTimeWindow.addFilledOrder(order=currentOrder, timestamp=currentOrder.timestamp)
+				orderIndex = orderIndex+1
+				if orderIndex == len(self.filledOrders): # Not quite elegant.
+					break
+		return orders
+	
+	@property
+	def in1Minutes(self):
+		"""Returns the market history as a list of one-minute time windows."""
+		
+		# This method rolls up the list of one-second windows, always declaring a
+		# "merger" window, taking note of the minute its second is associated with,
+		# and having it absorb the subsequent windows ("mergee windows") of that minute,
+		# found by a binary search on their ends. The first window of the next minute
+		# becomes the new merger window, and so on.
+		# 
+		# NOTE: If the data is missing data on the first minute, the first time window
+		# may be an inaccurate representation of that minute of the market.
+		# If this is used to draw candles in a graph, that has to be taken into account.
+		#
+		# In columnar mode, the minutes are found in one pass over the timestamp array instead.
+
+		if self.columnar:
+			return self._windows(60)
+		unmergedTimeWindows = self.in1Seconds
+		# The API lists orders newest first, but rolling up works in chronological order.
+		if len(unmergedTimeWindows) > 1 and unmergedTimeWindows[0]._begin > unmergedTimeWindows[-1]._begin:
+			unmergedTimeWindows.reverse()
+		return MarketHistoryTimeWindow.rollUp(unmergedTimeWindows, 60)
+		
+	def inMinutesDeprecated(self, minutes):
+		"""Kept for compatibility; use .inMinutes, which doesn't require a divisor of 60."""
+		if not 60 % minutes == 0:
+			raise MarketHistoryTimeWindowError(\
+				"A non-divisor of 60 has been specified as a time window: {0}".format(minutes))
+		return self.inMinutes(minutes)
+
+	def inInterval(self, seconds):
+		"""Returns the market history as a list of time windows of the specified length in seconds.
+		Windows are aligned to the UNIX epoch, and only windows with trades in them are returned."""
+		# Is not programmed to be robust against leap seconds.
+		_checkInterval(seconds)
+		if self.columnar:
+			return self._windows(seconds)
+		tradeColumns = self.tradeColumns
+		return tradeColumns.windowsAt(*tradeColumns.groupBoundaries(seconds), adapter=self.adapter)
+
+	def inSeconds(self, seconds):
+		return self.inInterval(seconds)
+
+	def inMinutes(self, minutes):
+		return self.inInterval(minutes*60)
+
+	def inHours(self, hours):
+		return self.inInterval(hours*3600)
+
+	def inDays(self, days):
+		return self.inInterval(days*86400)
+
+	def candles(self, seconds):
+		"""Returns the OHLCV Candles of the market history for time windows of the specified
+		length in seconds, computed in one pass over the sorted timestamps."""
+		_checkInterval(seconds)
+		if self.columnar:
+			return self._candles(seconds)
+		return self.tradeColumns.candles(seconds)
+
+	def between(self, begin=None, end=None):
+		"""The trades with begin <= timestamp < end as TradeColumns, found by binary search on
+		the timestamps. In columnar mode, they share the memory of .columns.
+		None means no limit on that side."""
+		return self.tradeColumns.between(begin, end)
+
+	def toDataFrame(self):
+		"""The trades as a pandas DataFrame, see TradeColumns.toDataFrame. For candles, use
+		.candles(seconds).toDataFrame()."""
+		return self.tradeColumns.toDataFrame()
+
+	def toArrowTable(self):
+		"""The trades as a pyarrow Table, see TradeColumns.toArrowTable."""
+		return self.tradeColumns.toArrowTable()
+
+	def candlesBetween(self, seconds, begin=None, end=None):
+		"""The Candles of seconds length overlapping begin <= timestamp < end, for zooming
+		into a long history. If the candles of that length are cached, this is a view of them;
+		otherwise, only the trades of the time range are aggregated, and nothing is cached."""
+		_checkInterval(seconds)
+		if self.columnar and seconds in self._candlesCache:
+			return self._candlesCache[seconds].between(begin, end)
+		if not begin is None and not end is None and end <= begin:
+			return Candles.empty(seconds)
+		# Whole time windows, so the first and last candles aren't cut short.
+		return self.between(None if begin is None else floorTimestamp(begin, seconds),\
+			None if end is None else floorTimestamp(end - 1, seconds) + seconds).candles(seconds)
+
+	@property
+	def tradeColumns(self):
+		"""TradeColumns of the market history. If we're not in columnar mode, they're made
+		from .filledOrders on every access."""
+		if self.columnar:
+			return self.columns
+		return self.adapter.tradeColumns([filledOrder.data for filledOrder in self.filledOrders])
+	
+#==========================================================
+class MarketHistoryStreamParser(object):
+	
+	#=============================
+	"""Parses a GetMarketHistory response while it's arriving, record by record.
+	
+	Feed it the response in chunks of bytes as they come in; every call to .feed returns the
+	trades that have been completed by that chunk, as dicts. Only the chunk being parsed and
+	the current, incomplete trade are held in memory, never the whole response."""
+	#=============================
+	
+	arrayPattern = re.compile(r'"Data"\s*:\s*(\[|null)')
+	
+	def __init__(self):
+		self.done = False
+		self._buffer = ""
+		self._inArray = False
+		self._decoder = json.JSONDecoder()
+		self._textDecoder = codecs.getincrementaldecoder("utf-8")()
+	
+	def feed(self, chunk):
+		"""Takes the next chunk of the response as bytes and returns the completed trades."""
+		if self.done:
+			return []
+		self._buffer += self._textDecoder.decode(chunk)
+		if not self._inArray:
+			match = self.arrayPattern.search(self._buffer)
+			if match is None:
+				# Keep enough of the end to find the array start if it's cut in half.
+				self._buffer = self._buffer[-32:]
+				return []
+			if match.group(1) == "null": # Unsuccessful API calls have no data.
+				self.done = True
+				return []
+			self._buffer = self._buffer[match.end():]
+			self._inArray = True
+		trades = []
+		position = 0
+		length = len(self._buffer)
+		while position < length:
+			character = self._buffer[position]
+			if character in " \t\r\n,":
+				position += 1
+			elif character == "]":
+				self.done = True
+				break
+			else:
+				try:
+					trade, position = self._decoder.raw_decode(self._buffer, position)
+				except json.JSONDecodeError:
+					break # The trade isn't complete yet.
+				trades.append(trade)
+		self._buffer = self._buffer[position:]
+		return trades
+	
+	def close(self):
+		"""Call after the last chunk, to make sure the response was complete."""
+		if not self.done:
+			raise json.JSONDecodeError("Incomplete GetMarketHistory response", self._buffer, 0)
+
+#==========================================================
+class CryptopiaAdapter(ExchangeAdapter):
+	
+	#=============================
+	"""Cryptopia's GetMarketHistory API call. Responses look like {"Success": true, "Data": [...]},
+	with trades like {"Type": "Buy", "Price": ..., "Amount": ..., "Total": ..., "Timestamp": ...},
+	newest first.
+	
+	Parameters:
+		
+		addressTemplate (str): Default: defaultAddressTemplate
+			Address of the API call, with a {symbol} placeholder.
+		
+		orderBookAddressTemplate (str): Default: defaultOrderBookAddressTemplate
+			Address of the GetMarketOrders API call, with a {symbol} placeholder."""
+	#=============================
+	
+	timestampKey = "Timestamp"
+	
+	def __init__(self, addressTemplate=defaultAddressTemplate, orderBookAddressTemplate=defaultOrderBookAddressTemplate):
+		self.addressTemplate = addressTemplate
+		self.orderBookAddressTemplate = orderBookAddressTemplate
+	
+	def address(self, symbol):
+		return self.addressTemplate.format(symbol=symbol)
+	
+	def orderBookAddress(self, symbol):
+		return self.orderBookAddressTemplate.format(symbol=symbol)
+	
+	def parseOrderBook(self, response):
+		# Like {"Success": true, "Data": {"Buy": [{"Price": ..., "Volume": ..., ...}], "Sell": [...]}}
+		orders = json.loads(response)["Data"] or {}
+		return [(order["Price"], order["Volume"]) for order in orders.get("Buy") or []],\
+			[(order["Price"], order["Volume"]) for order in orders.get("Sell") or []]
+	
+	def parseResponse(self, response):
+		# Unsuccessful API calls have no data.
+		return json.loads(response)["Data"] or []
+	
+	def tradeColumns(self, trades):
+		count = len(trades)
+		# The API lists trades newest first. Reversing such lists before sorting keeps
+		# trades of the same second in chronological order.
+		if count > 1 and trades[0]["Timestamp"] > trades[-1]["Timestamp"]:
+			trades = trades[::-1]
+		return TradeColumns(\
+			timestamps=np.fromiter((trade["Timestamp"] for trade in trades), np.int64, count),\
+			prices=np.fromiter((trade["Price"] for trade in trades), np.float64, count),\
+			amounts=np.fromiter((trade["Amount"] for trade in trades), np.float64, count),\
+			totals=np.fromiter((trade["Total"] for trade in trades), np.float64, count),\
+			sides=np.fromiter((1 if trade["Type"] == "Buy" else -1 for trade in trades), np.int8, count))
+	
+	def rawTrade(self, trade):
+		return {"Type": "Buy" if trade.side == 1 else "Sell", "Price": trade.price, "Amount": trade.amount,\
+			"Total": trade.total, "Timestamp": trade.timestamp}
+	
+	def streamParser(self):
+		return MarketHistoryStreamParser()
+
+#==========================================================
+class FileAdapter(ExchangeAdapter):
+	
+	#=============================
+	"""Reads market histories from local files instead of an exchange, for working offline
+	and testing with fixtures. The files hold responses of another adapter's exchange, such
+	as saved GetMarketHistory responses, and are parsed by that adapter.
+	
+	Parameters:
+		
+		pathTemplate (str):
+			Path of the file of a market, with a {symbol} placeholder.
+		
+		adapter (ExchangeAdapter or None): Default: None
+			The adapter of the exchange the responses are from. None for a CryptopiaAdapter.
+		
+		orderBookPathTemplate (str or None): Default: None
+			Path of the order book file of a market, with a {symbol} placeholder, if any."""
+	#=============================
+	
+	remote = False
+	
+	def __init__(self, pathTemplate, adapter=None, orderBookPathTemplate=None):
+		self.pathTemplate = pathTemplate
+		self.adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.orderBookPathTemplate = orderBookPathTemplate
+	
+	@property
+	def timestampKey(self):
+		return self.adapter.timestampKey
+	
+	@property
+	def newestFirst(self):
+		return self.adapter.newestFirst
+	
+	def address(self, symbol):
+		return os.path.expanduser(self.pathTemplate.format(symbol=symbol))
+	
+	def parseResponse(self, response):
+		return self.adapter.parseResponse(response)
+	
+	def tradeColumns(self, trades):
+		return self.adapter.tradeColumns(trades)
+	
+	def timestamp(self, trade):
+		return self.adapter.timestamp(trade)
+	
+	def rawTrade(self, trade):
+		return self.adapter.rawTrade(trade)
+	
+	def streamParser(self):
+		return self.adapter.streamParser()
+	
+	def orderBookAddress(self, symbol):
+		if self.orderBookPathTemplate is None:
+			raise ValueError("Can't find the order book of {0}: The FileAdapter has no orderBookPathTemplate."\
+				.format(symbol))
+		return os.path.expanduser(self.orderBookPathTemplate.format(symbol=symbol))
+	
+	def parseOrderBook(self, response):
+		return self.adapter.parseOrderBook(response)
+	
+	def open(self, address):
+		return open(address, "rb")
+
+#==========================================================
+class Data(object):
+	
+	#=============================
+	"""Currency data handler for getting and caching data from a web API.
+
+	By default, the cache file is overwritten with the full API response on every refresh,
+	and .dict and .string hold it.
+
+	In incremental mode, only trades we haven't seen yet are appended to a TradeLog next to
+	the cache file (storePath + ".log"). .trades holds all logged trades and .newTrades the
+	ones added by the latest refresh, both oldest first; .dict and .string stay empty.
+	An existing cache file is used to start the log.
+	
+	In binary mode, trades are appended the same way, but to a memory-mapped TradeStore
+	(storePath + ".trades"), and .trades and .newTrades are TradeColumns. An existing trade
+	log or cache file is converted into the store when it's first created.
+	
+	With streaming, trades are parsed while the response of the web API is arriving, in
+	incremental and binary mode, and only new ones are kept. As the API lists trades newest
+	first, the download stops as soon as it reaches trades we already have.
+	
+	Responses are fetched and parsed by an ExchangeAdapter, a CryptopiaAdapter by default,
+	from the .address the adapter has for the symbol of the market.
+	
+	In incremental and binary mode, the new trades of every refresh can also be appended to
+	a TradeArchive, under the file name of storePath as the market."""
+	#=============================
+	
+	streamChunkSize = 65536
+	
+	def __init__(self, symbol, storePath, updateInterval=defaultUpdateInterval, startFresh=True,\
+	incremental=False, binary=False, streaming=False, adapter=None, archive=None):
+		self.cacheFile = File(storePath, make=True, makeDirs=True)
+		self.symbol = symbol
+		self.adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.updateInterval = updateInterval
+		self.incremental = incremental
+		self.binary = binary
+		self.streaming = streaming
+		self.tradeLog = TradeLog("{0}.log".format(storePath), timestampKey=self.adapter.timestampKey)\
+			if incremental or binary else None
+		self.tradeStore = TradeStore("{0}.trades".format(storePath)) if binary else None
+		self.archive = archive
+		self.market = os.path.basename(storePath)
+		self.dict = {}
+		self.string = ""
+		self.trades = []
+		self.newTrades = []
+		self._tradeLogLoaded = False
+		# Before refreshing, which would start the trade log from the response instead.
+		self._convertLegacyCache()
+		if startFresh:
+			self.refresh(noInit=True)
+		self._initData()
+	
+	@property
+	def address(self):
+		"""Where the adapter fetches the market history of our symbol from."""
+		return self.adapter.address(self.symbol)
+	
+	@property
+	def appendOnlyStore(self):
+		"""The TradeLog or TradeStore we're appending to, or None if we're overwriting the cache."""
+		if self.binary:
+			return self.tradeStore
+		if self.incremental:
+			return self.tradeLog
+		return None
+	
+	def _initData(self):
+		"""Initialize the cacheFile data into the various data structures we use, such as .dict."""
+		with metrics.timing("data.initData.seconds"):
+			if self.binary:
+				self._initTradeStore()
+				return
+			if self.incremental:
+				self._initTradeLog()
+				return
+			self.string = self.cacheFile.read()
+			# The cache is empty until the first refresh if we didn't start fresh.
+			self.dict = json.loads(self.string) if not self.string == "" else {}
+	
+	def _convertLegacyCache(self):
+		"""If there's no trade log (in incremental mode) or store (in binary mode) yet, start
+		it with the trades of what we had before: The cache file for the log, and the log or
+		else the cache file for the store. It takes over the age of what it was converted
+		from, so that it's as due for a refresh as that was."""
+		store = self.appendOnlyStore
+		if store is None or store.exists:
+			return
+		if self.binary and self.tradeLog.exists:
+			modified = time.time() - self.tradeLog.secondsSinceLastModification
+			store.appendNew(self.adapter.tradeColumns(self.tradeLog.read()))
+		else:
+			cache = self.cacheFile.read()
+			if cache == "":
+				return
+			modified = time.time() - self.cacheFile.secondsSinceLastModification
+			trades = self.adapter.parseResponse(cache)
+			store.appendNew(self.adapter.tradeColumns(trades) if self.binary else trades)
+		if store.exists:
+			os.utime(store.path, (modified, modified))
+	
+	def _initTradeLog(self):
+		"""Load the trade log once; after that, refreshes extend .trades themselves."""
+		if self._tradeLogLoaded:
+			return
+		self._convertLegacyCache()
+		self.trades = self.tradeLog.read()
+		self.newTrades = list(self.trades)
+		self._tradeLogLoaded = True
+	
+	def _initTradeStore(self):
+		"""Map the trade store, converting the trade log or cache file if there's no store yet."""
+		self._convertLegacyCache()
+		# Mapping is cheap, so we just map again, which also picks up appended trades.
+		self.trades = self.tradeStore.columns()
+		if not self._tradeLogLoaded:
+			self.newTrades = self.trades
+			self._tradeLogLoaded = True
+	
+	def _download(self):
+		"""Returns the response of the web API as a string."""
+		return self.adapter.download(self.address)
+	
+	@property
+	def due(self):
+		"""True if the cache is older than updateInterval or empty, False otherwise."""
+		if not self.appendOnlyStore is None:
+			return not self.appendOnlyStore.exists\
+				or self.appendOnlyStore.secondsSinceLastModification > self.updateInterval
+		return self.cacheFile.secondsSinceLastModification > self.updateInterval\
+			or self.cacheFile.read() == ""
+	
+	def _downloadNewTrades(self):
+		"""Streams the response of the web API through the stream parser of the adapter, and
+		returns the trades not older than the newest one we have, in the order of the response."""
+		newestTimestamp = self.appendOnlyStore.newestTimestamp
+		parser = self.adapter.streamParser()
+		trades = []
+		previousTimestamp = None
+		reachedKnownTrades = False
+		downloadedBytes = 0
+		response = self.adapter.open(self.address)
+		try:
+			while not parser.done and not reachedKnownTrades:
+				chunk = response.read(self.streamChunkSize)
+				downloadedBytes += len(chunk)
+				if chunk == b"":
+					parser.close()
+					break
+				for trade in parser.feed(chunk):
+					timestamp = self.adapter.timestamp(trade)
+					if newestTimestamp == None or timestamp >= newestTimestamp:
+						trades.append(trade)
+					elif self.adapter.newestFirst and (previousTimestamp == None or timestamp <= previousTimestamp):
+						# Newest first, so everything from here on is older still.
+						reachedKnownTrades = True
+						break
+					previousTimestamp = timestamp
+		finally:
+			response.close()
+		metrics.observe("data.download.bytes", downloadedBytes)
+		return trades
+	
+	def store(self, response):
+		"""Store a response of the web API in the cache, regardless of whether it's due.
+		This is for the likes of MarketsFetcher, which do the downloading themselves."""
+		with metrics.timing("data.store.seconds"):
+			if not self.appendOnlyStore is None:
+				self.storeTrades(self.adapter.parseResponse(response))
+			elif self.cacheFile.writable:
+				self.cacheFile.write(response)
+	
+	def refreshCache(self):
+		"""Refresh the cacheFile with data from the web API."""
+		if self.due:
+			dprint("Refreshing data.")
+			metrics.count("data.refreshes")
+			if self.streaming and not self.appendOnlyStore is None and not self.adapter.streamParser() is None:
+				# Streaming parses while downloading, so the two aren't told apart.
+				with metrics.timing("data.downloadAndParse.seconds"):
+					trades = self._downloadNewTrades()
+				self.storeTrades(trades)
+			else:
+				with metrics.timing("data.download.seconds"):
+					response = self._download()
+				metrics.observe("data.download.bytes", len(response))
+				self.store(response)
+			dprint("Done refreshing data.")
+		elif not self.appendOnlyStore is None:
+			# Nothing's new, so the trades of the previous refresh mustn't be processed again.
+			self.newTrades = TradeColumns([], [], [], [], [], presorted=True) if self.binary else []
+	
+	def storeTrades(self, trades):
+		"""Append those of the trades (as listed by the API) we don't have yet to the trade log
+		or store. Only for incremental and binary mode."""
+		if self.binary:
+			self.newTrades = self.tradeStore.appendNew(self.adapter.tradeColumns(trades))
+		else:
+			self.newTrades = self.tradeLog.appendNew(trades)
+		if not self.archive is None:
+			self.archive.append(self.market,\
+				self.newTrades if self.binary else self.adapter.tradeColumns(self.newTrades))
+		if self.appendOnlyStore.exists:
+			self.appendOnlyStore.touch()
+		if self._tradeLogLoaded:
+			if self.binary:
+				self.trades = self.tradeStore.columns()
+			else:
+				self.trades.extend(self.newTrades)
+	
+	def backfill(self, path, **kwargs):
+		"""Imports a dump of historical trades into the trade store, using a BackfillImporter
+		with the specified keyword arguments. Returns how many trades were new. Only for
+		binary mode."""
+		if not self.binary:
+			raise TradeStoreError("Only Data objects in binary mode have a trade store to backfill.")
+		kwargs.setdefault("adapter", self.adapter)
+		imported = BackfillImporter(**kwargs).importInto(path, self.tradeStore)
+		self._initData()
+		return imported
+	
+	def refresh(self, noInit=False):
+		"""Have the cache file refreshed and re-initialize our data from it."""
+		self.refreshCache()
+		if not noInit:
+			self._initData()
+
+
+#==========================================================
+class OrderBookCollector(object):
+	
+	#=============================
+	"""Collects snapshots of the order book of a market from a web API into an OrderBookStore
+	(storePath + ".book"), next to the Data of the market.
+	
+	Snapshots are meant to be taken every few seconds, so rather than keeping every response
+	like Data does with market histories, only the levels that changed since the previous
+	snapshot are stored, with a full snapshot every keyframeInterval seconds. Any stored
+	snapshot can be rebuilt with .at.
+	
+	Collectors can be refreshed along with Data objects by MarketsFetcher (or refreshAll).
+	
+	Parameters:
+		
+		symbol (str):
+			Symbol of the market, which the adapter's .orderBookAddress is for.
+		
+		storePath (str):
+			Path of the market's files, like the storePath of Data.
+		
+		snapshotInterval (int): Default: 5
+			Seconds after which a new snapshot is due.
+		
+		keyframeInterval (int): Default: 300
+			Seconds between full snapshots, see OrderBookStore.
+		
+		adapter (ExchangeAdapter or None): Default: None
+			What the responses are fetched and parsed with. None for a CryptopiaAdapter."""
+	#=============================
+	
+	def __init__(self, symbol, storePath, snapshotInterval=5, keyframeInterval=300, adapter=None):
+		self.symbol = symbol
+		self.adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.snapshotInterval = snapshotInterval
+		self.bookStore = OrderBookStore("{0}.book".format(storePath), keyframeInterval=keyframeInterval)
+		self.book = None
+		self._initData()
+	
+	@property
+	def address(self):
+		"""Where the adapter fetches the order book of our symbol from."""
+		return self.adapter.orderBookAddress(self.symbol)
+	
+	def _initData(self):
+		"""Picks up the newest stored snapshot as .book."""
+		self.book = self.bookStore.newest()
+	
+	@property
+	def due(self):
+		"""True if the newest snapshot is older than snapshotInterval or there's none."""
+		return not self.bookStore.exists or self.bookStore.secondsSinceLastModification >= self.snapshotInterval
+	
+	def store(self, response, timestamp=None):
+		"""Stores an order book response of the web API as a snapshot taken at timestamp, which
+		defaults to now. This is for the likes of MarketsFetcher, which do the downloading
+		themselves."""
+		bids, asks = self.adapter.parseOrderBook(response)
+		self.bookStore.append(OrderBook(int(time.time()) if timestamp is None else timestamp, bids, asks))
+	
+	def refresh(self):
+		"""Take a snapshot if one is due."""
+		if self.due:
+			self.store(self.adapter.download(self.address))
+			self._initData()
+	
+	def at(self, timestamp):
+		"""The order book as of the newest snapshot not newer than timestamp, or None."""
+		return self.bookStore.at(timestamp)
+
+
+#==========================================================
+class MarketsFetcher(object):
+	
+	#=============================
+	"""Refreshes the caches of several Data objects (or OrderBookCollectors) concurrently,
+	using asyncio.
+	
+	All the requests are in flight at the same time (up to the concurrency limit), so a
+	refresh of all markets takes about as long as the slowest request. Connections are
+	kept alive and reused for further requests to the same host.
+	
+	Parameters:
+		
+		datas (list):
+			The Data objects to refresh.
+		
+		concurrency (int): Default: 8
+			How many requests may be in flight at the same time.
+		
+		timeout (float): Default: 30
+			Seconds a single request attempt may take, including connecting and following
+			redirects.
+		
+		retries (int): Default: 3
+			How many times a failed request is retried. Only connection problems,
+			timeouts and 429/5xx responses are retried.
+		
+		backoff (float): Default: 1.0
+			Seconds to wait before the first retry; doubled with every further retry,
+			with a bit of random jitter on top.
+		
+		force (bool): Default: False
+			If False, only Data objects that are .due are refreshed.
+	
+	Redirects are followed, up to maxRedirects of them per request. Requests to hosts for
+	which a proxy is configured (as in http_proxy, https_proxy and no_proxy) are made
+	through urllib instead, in a thread each, as it knows how to talk to proxies."""
+	#=============================
+	
+	maxRedirects = 5
+	
+	def __init__(self, datas, concurrency=8, timeout=30, retries=3, backoff=1.0, force=False):
+		self.datas = datas
+		self.concurrency = concurrency
+		self.timeout = timeout
+		self.retries = retries
+		self.backoff = backoff
+		self.force = force
+		# Idle connections by (scheme, host, port), as lists of (reader, writer) tuples.
+		self._idleConnections = {}
+		self._sslContext = None
+		from urllib.request import getproxies
+		self._proxies = getproxies()
+		
+	def run(self):
+		"""Refresh the Data objects, and return a dict with an exception for every one of
+		them that couldn't be refreshed, keyed by the Data object."""
+		return asyncio.run(self._run())
+	
+	async def _run(self):
+		semaphore = asyncio.Semaphore(self.concurrency)
+		datas = [data for data in self.datas if self.force or data.due]
+		try:
+			results = await asyncio.gather(*[self._refresh(data, semaphore) for data in datas],\
+				return_exceptions=True)
+		finally:
+			self._closeIdleConnections()
+		return {data: result for data, result in zip(datas, results) if isinstance(result, Exception)}
+	
+	async def _refresh(self, data, semaphore):
+		if data.adapter.remote:
+			async with semaphore:
+				response = (await self.fetch(data.address)).decode()
+		else:
+			response = data.adapter.download(data.address)
+		data.store(response)
+		data._initData()
+	
+	async def fetch(self, address):
+		"""Returns the body of a GET request to the address as bytes, retrying as configured."""
+		attempt = 0
+		while True:
+			try:
+				with metrics.timing("fetch.seconds"):
+					if self._proxied(address):
+						request = asyncio.get_running_loop().run_in_executor(None, self._getThroughProxy, address)
+					else:
+						request = self._get(address)
+					body = await asyncio.wait_for(request, self.timeout)
+				metrics.observe("fetch.bytes", len(body))
+				return body
+			except (DataFetchRetryableError, OSError, asyncio.TimeoutError,\
+			asyncio.IncompleteReadError) as error:
+				if attempt >= self.retries:
+					metrics.count("fetch.failures")
+					raise DataFetchError("Giving up on {address} after {attempts} attempts: {error!r}"\
+						.format(address=address, attempts=attempt+1, error=error))
+				metrics.count("fetch.retries")
+				await asyncio.sleep(self.backoff * 2**attempt * (1 + random.random()/4))
+				attempt += 1
+			except DataFetchError:
+				metrics.count("fetch.failures")
+				raise
+	
+	def _proxied(self, address):
+		"""Whether a proxy is configured for the address."""
+		from urllib.request import proxy_bypass
+		url = urlsplit(address)
+		return url.scheme in self._proxies and not proxy_bypass(url.hostname or "")
+	
+	def _getThroughProxy(self, address):
+		"""Like _get, but blocking, with urllib, which picks up the proxy on its own."""
+		from urllib.request import Request, urlopen
+		from urllib.error import HTTPError
+		try:
+			with urlopen(Request(address), timeout=self.timeout) as response:
+				return response.read()
+		except HTTPError as error:
+			error.close()
+			if error.code == 429 or error.code >= 500:
+				raise DataFetchRetryableError("HTTP {0} from {1}".format(error.code, address))
+			raise DataFetchError("HTTP {0} from {1}".format(error.code, address))
+	
+	async def _get(self, address, redirects=0):
+		url = urlsplit(address)
+		https = url.scheme == "https"
+		defaultPort = 443 if https else 80
+		key = (url.scheme, url.hostname, url.port or defaultPort)
+		path = url.path or "/"
+		if url.query:
+			path = "{0}?{1}".format(path, url.query)
+		# Not url.netloc, which might have credentials in it.
+		host = url.hostname or ""
+		host = "[{0}]".format(host) if ":" in host else host
+		if not url.port in (None, defaultPort):
+			host = "{0}:{1}".format(host, url.port)
+		request = "GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: identity\r\n"\
+			"Connection: keep-alive\r\n\r\n".format(path=path, host=host).encode()
+		# An idle connection might have been closed by the server in the meantime, in which
+		# case we retry right away on a new one.
+		while True:
+			reader, writer, reused = await self._connection(key, https)
+			try:
+				writer.write(request)
+				await writer.drain()
+				status, headers, body = await self._readResponse(reader)
+				break
+			except (OSError, asyncio.IncompleteReadError):
+				writer.close()
+				if not reused:
+					raise
+			except BaseException:
+				# Cancelled by a timeout, or the response was malformed. Either way, we don't
+				# know where in the response the connection is.
+				writer.close()
+				raise
+		if headers.get("connection", "").lower() == "close" or self._hasBody(status)\
+		and not "content-length" in headers and not headers.get("transfer-encoding", "").lower() == "chunked":
+			writer.close()
+		else:
+			self._idleConnections.setdefault(key, []).append((reader, writer))
+		if status in (301, 302, 303, 307, 308):
+			if not "location" in headers:
+				raise DataFetchError("HTTP {0} without a location from {1}".format(status, address))
+			if redirects >= self.maxRedirects:
+				raise DataFetchError("More than {0} redirects from {1}".format(self.maxRedirects, address))
+			return await self._get(urljoin(address, headers["location"]), redirects+1)
+		if status == 429 or status >= 500:
+			raise DataFetchRetryableError("HTTP {0} from {1}".format(status, address))
+		if not 200 <= status < 300:
+			# Like 304, which only ever answers conditional requests, and we don't make any.
+			raise DataFetchError("HTTP {0} from {1}".format(status, address))
+		return body
+	
+	async def _connection(self, key, https):
+		"""Returns a (reader, writer, reused) tuple, reusing an idle connection if there is one."""
+		idleConnections = self._idleConnections.get(key, [])
+		while len(idleConnections) > 0:
+			reader, writer = idleConnections.pop()
+			if not reader.at_eof():
+				return reader, writer, True
+			writer.close()
+		if https and self._sslContext == None:
+			self._sslContext = ssl.create_default_context()
+		reader, writer = await asyncio.open_connection(key[1], key[2],\
+			ssl=self._sslContext if https else None)
+		return reader, writer, False
+	
+	@staticmethod
+	def _hasBody(status):
+		"""Whether a response with the status has a body, even if it's empty. Those without
+		one end with their headers, whether they have a Content-Length or not."""
+		return not (100 <= status < 200 or status in (204, 304))
+	
+	async def _readResponse(self, reader):
+		"""Reads an HTTP/1.1 response and returns (status, headers, body). Interim (1xx)
+		responses before it are skipped."""
+		status = None
+		while status is None or 100 <= status < 200 and not status == 101:
+			statusLine = await reader.readline()
+			if statusLine == b"":
+				raise asyncio.IncompleteReadError(b"", None)
+			try:
+				status = int(statusLine.split()[1])
+			except (IndexError, ValueError):
+				raise DataFetchError("Malformed HTTP status line: {0!r}".format(statusLine))
+			headers = {}
+			while True:
+				line = await reader.readline()
+				if line in (b"\r\n", b"\n", b""):
+					break
+				name, separator, value = line.decode("latin-1").partition(":")
+				headers[name.strip().lower()] = value.strip()
+		if not self._hasBody(status):
+			body = b""
+		elif headers.get("transfer-encoding", "").lower() == "chunked":
+			chunks = []
+			while True:
+				sizeLine = await reader.readline()
+				try:
+					size = int(sizeLine.split(b";")[0], 16)
+				except ValueError:
+					raise DataFetchError("Malformed HTTP chunk size: {0!r}".format(sizeLine))
+				if size == 0:
+					# Skip trailers.
+					while not (await reader.readline()) in (b"\r\n", b"\n", b""):
+						pass
+					break
+				chunks.append(await reader.readexactly(size))
+				await reader.readexactly(2)
+			body = b"".join(chunks)
+		elif "content-length" in headers:
+			body = await reader.readexactly(int(headers["content-length"]))
+		else:
+			body = await reader.read()
+		return status, headers, body
+	
+	def _closeIdleConnections(self):
+		for connections in self._idleConnections.values():
+			for reader, writer in connections:
+				writer.close()
+		self._idleConnections = {}
+
+def refreshAll(datas, **kwargs):
+	"""Refresh the caches of all the specified Data objects concurrently.
+	Takes the same keyword arguments as MarketsFetcher."""
+	return MarketsFetcher(datas, **kwargs).run()
+
+#==========================================================
+class Scanner(object):
+	
+	#=============================
+	"""Keeps refreshing markets and emits their candles as they're sealed, as JSON lines.
+	
+	Every market is refreshed every updateInterval seconds, plus a random delay of up to
+	jitter seconds, so markets drift apart rather than hitting the API all at once. Markets
+	which happen to be due at the same time are refreshed together by a MarketsFetcher.
+	
+	Trades are kept in a binary TradeStore per market. Only the trades a refresh appended to
+	it are fed to the market's CandleAggregator, so the work per refresh is proportional to
+	the number of new trades, and memory stays flat no matter how long we're running.
+	Upon starting, the aggregators are primed with the stored trades of the candles that are
+	current, without emitting anything, so a restart picks up where we left off.
+	
+	Every sealed candle is a line like:
+		{"symbol": "NEBL", "interval": 60, "begin": 1514764800, "open": ..., "high": ...,
+		"low": ..., "close": ..., "volume": ..., "total": ..., "count": ...}
+	
+	Parameters:
+		
+		symbols (list): Default: symbols
+			The markets to scan.
+		
+		intervals (tuple): Default: (60, 300, 900, 3600)
+			Candle lengths in seconds.
+		
+		storeDirPath (str): Default: defaultMarketscannersDirPath
+			Where the trade stores of the markets are kept.
+		
+		updateInterval (int): Default: defaultUpdateInterval
+			Seconds between refreshes of a market.
+		
+		jitter (float): Default: 30
+			Up to how many seconds to randomly add to updateInterval.
+		
+		output (str): Default: "-"
+			"-" for stdout, otherwise a directory, where the candles of each market and
+			interval are appended to a file named like "NEBL-60.jsonl".
+		
+		adapter (ExchangeAdapter or None): Default: None
+			The exchange (or files) the markets are read from. None for a CryptopiaAdapter.
+		
+		maxCandles (int): Default: 100
+			How many sealed candles the aggregators keep per interval.
+		
+		archiveDirPath (str or None): Default: None
+			If specified, new trades are also kept in a TradeArchive there, the days of which
+			are compacted once they're over.
+		
+		Further keyword arguments are passed on to MarketsFetcher."""
+	#=============================
+	
+	def __init__(self, symbols=symbols, intervals=(60, 300, 900, 3600), storeDirPath=defaultMarketscannersDirPath,\
+	updateInterval=defaultUpdateInterval, jitter=30, output="-", adapter=None, maxCandles=100,\
+	archiveDirPath=None, **fetcherKwargs):
+		adapter = adapter if not adapter is None else CryptopiaAdapter()
+		self.symbols = list(symbols)
+		self.intervals = tuple(intervals)
+		self.updateInterval = updateInterval
+		self.jitter = jitter
+		self.output = output
+		self.fetcherKwargs = fetcherKwargs
+		self.archive = TradeArchive(archiveDirPath) if not archiveDirPath is None else None
+		# Beginning of the day up to which the archive is compacted.
+		self._compactedBefore = None
+		self.datas = {symbol: Data(\
+			symbol=symbol,\
+			storePath=os.path.join(storeDirPath, symbol),\
+			updateInterval=updateInterval,\
+			startFresh=False,\
+			binary=True,\
+			adapter=adapter,\
+			archive=self.archive) for symbol in self.symbols}
+		self.aggregators = {symbol: CandleAggregator(intervals=self.intervals, maxSealed=maxCandles,\
+			onSeal=lambda interval, candle, symbol=symbol: self._emit(symbol, interval, candle))\
+			for symbol in self.symbols}
+		# How many of the stored trades of each market the aggregator has seen.
+		self.consumedCounts = {symbol: 0 for symbol in self.symbols}
+		# Lines waiting to be written, by output file name (None for stdout).
+		self._pendingLines = {}
+		self._priming = False
+	
+	def prime(self):
+		"""Feeds the aggregators the stored trades of their current candles, silently."""
+		self._priming = True
+		try:
+			for symbol, data in self.datas.items():
+				store = data.tradeStore
+				records = store.records()
+				if len(records) > 0:
+					newestTimestamp = int(records["timestamp"][-1])
+					since = min(floorTimestamp(newestTimestamp, interval) for interval in self.intervals)
+					self.consumedCounts[symbol] = store.searchsorted(since, records=records)
+				self._consume(symbol, records)
+		finally:
+			self._priming = False
+	
+	def _consume(self, symbol, records=None):
+		"""Feeds the aggregator of the market the stored trades it hasn't seen yet."""
+		if records is None:
+			records = self.datas[symbol].tradeStore.records()
+		newRecords = records[self.consumedCounts[symbol]:]
+		self.aggregators[symbol].addTrades(TradeColumns(newRecords["timestamp"], newRecords["price"],\
+			newRecords["amount"], newRecords["total"], newRecords["side"], presorted=True))
+		self.consumedCounts[symbol] = len(records)
+	
+	def _emit(self, symbol, interval, candle):
+		if self._priming:
+			return
+		line = json.dumps({"symbol": symbol, "interval": interval, "begin": candle._begin,\
+			"open": candle.open, "high": candle.high, "low": candle.low, "close": candle.close,\
+			"volume": candle.volume, "total": candle.total, "count": candle.count})
+		fileName = None if self.output == "-" else "{symbol}-{interval}.jsonl"\
+			.format(symbol=symbol, interval=interval)
+		self._pendingLines.setdefault(fileName, []).append(line)
+	
+	def _flush(self):
+		"""Write the lines emitted since the last flush."""
+		for fileName, lines in self._pendingLines.items():
+			text = "".join("{0}\n".format(line) for line in lines)
+			if fileName is None:
+				sys.stdout.write(text)
+				sys.stdout.flush()
+			else:
+				os.makedirs(self.output, exist_ok=True)
+				with open(os.path.join(self.output, fileName), "a") as outputFile:
+					outputFile.write(text)
+		self._pendingLines = {}
+	
+	def scan(self, symbols):
+		"""Refresh the specified markets and emit the candles that got sealed by new trades."""
+		failures = MarketsFetcher([self.datas[symbol] for symbol in symbols], force=True,\
+			**self.fetcherKwargs).run()
+		for symbol in symbols:
+			if self.datas[symbol] in failures:
+				print("Couldn't refresh {symbol}: {error}".format(symbol=symbol,\
+					error=failures[self.datas[symbol]]), file=sys.stderr)
+			else:
+				self._consume(symbol)
+		self._flush()
+		if not self.archive is None:
+			today = floorTimestamp(int(time.time()), TradeArchive.daySeconds)
+			if not self._compactedBefore == today:
+				self.archive.compactAll(before=today)
+				self._compactedBefore = today
+	
+	def _nextRefresh(self, now):
+		return now + self.updateInterval + random.uniform(0, self.jitter)
+	
+	def run(self):
+		"""Scan until interrupted."""
+		import heapq
+		self.prime()
+		now = time.time()
+		# (Time of the next refresh, symbol). Markets start spread out over the jitter.
+		schedule = [(now + random.uniform(0, self.jitter), symbol) for symbol in self.symbols]
+		heapq.heapify(schedule)
+		while len(schedule) > 0:
+			delay = schedule[0][0] - time.time()
+			if delay > 0:
+				time.sleep(delay)
+			now = time.time()
+			dueSymbols = []
+			while len(schedule) > 0 and schedule[0][0] <= now:
+				dueSymbols.append(heapq.heappop(schedule)[1])
+			self.scan(dueSymbols)
+			now = time.time()
+			for symbol in dueSymbols:
+				heapq.heappush(schedule, (self._nextRefresh(now), symbol))
+
+def main(arguments=None):
+	"""Command line entry point: Runs a Scanner until interrupted."""
+	import argparse
+	parser = argparse.ArgumentParser(description="Scan markets for new trades and emit"\
+		" their candles as JSON lines as they're completed.")
+	parser.add_argument("symbols", nargs="*", default=symbols,\
+		help="Symbols of the markets to scan. Default: {0}".format(" ".join(symbols)))
+	parser.add_argument("-i", "--intervals", type=int, nargs="+", default=[60, 300, 900, 3600],\
+		help="Candle lengths in seconds. Default: 60 300 900 3600")
+	parser.add_argument("-c", "--cache-dir", default=defaultMarketscannersDirPath,\
+		help="Where to keep the trade stores. Default: {0}".format(defaultMarketscannersDirPath))
+	parser.add_argument("-u", "--update-interval", type=float, default=defaultUpdateInterval,\
+		help="Seconds between refreshes of a market. Default: {0}".format(defaultUpdateInterval))
+	parser.add_argument("-j", "--jitter", type=float, default=30,\
+		help="Up to how many seconds to randomly add to the update interval. Default: 30")
+	parser.add_argument("-o", "--output", default="-",\
+		help="\"-\" for stdout, or a directory to append the candles of each market and interval"\
+			" to files named like NEBL-60.jsonl. Default: -")
+	parser.add_argument("-a", "--address-template", default=defaultAddressTemplate,\
+		help="Address of the market history API call, with a {{symbol}} placeholder. Default: {0}"\
+			.format(defaultAddressTemplate))
+	parser.add_argument("-f", "--files", metavar="PATH_TEMPLATE",\
+		help="Read the markets from local files holding API responses instead, such as"\
+			" ~/fixtures/{symbol}.json.")
+	parser.add_argument("--concurrency", type=int, default=8,\
+		help="How many requests may be in flight at the same time. Default: 8")
+	parser.add_argument("--archive-dir", metavar="DIR", const=os.path.join(defaultMarketscannersDirPath, "archive"),\
+		nargs="?", help="Also keep new trades in a compressed archive partitioned by market and day,"\
+			" in DIR or, if not specified, {0}.".format(os.path.join(defaultMarketscannersDirPath, "archive")))
+	parser.add_argument("--metrics", action="store_true",\
+		help="Record timings and sizes of fetching, parsing and aggregating, and print them to stderr"\
+			" when leaving.")
+	args = parser.parse_args(arguments)
+	scanner = Scanner(\
+		symbols=args.symbols,\
+		intervals=args.intervals,\
+		storeDirPath=args.cache_dir,\
+		updateInterval=args.update_interval,\
+		jitter=args.jitter,\
+		output=args.output,\
+		adapter=FileAdapter(args.files, CryptopiaAdapter(args.address_template)) if args.files\
+			else CryptopiaAdapter(args.address_template),\
+		archiveDirPath=args.archive_dir,\
+		concurrency=args.concurrency)
+	# Leave quietly on SIGTERM as well, as when run by a service manager.
+	signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))
+	metrics.enabled = args.metrics
+	try:
+		scanner.run()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		if args.metrics:
+			print(metrics.report(), file=sys.stderr)
+
+#=======================================================================================
+# Action
+#=======================================================================================
+
+if __name__ == "__main__":
+	main()
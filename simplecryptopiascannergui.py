@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""The Kivy GUI of simplecryptopiascanner. Lives in its own module, so that importing the
+scanner itself doesn't load kivy and matplotlib."""
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+#=============================
+# Builtins.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+#=============================
+# Third party.
+import numpy as np
+import matplotlib.pyplot as pyplot
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+# Kivy
+import kivy
+import kivy.app
+import kivy.uix.boxlayout
+import kivy.uix.gridlayout
+from kivy.clock import Clock
+# https://github.com/kivy-garden/garden.matplotlib
+# Could also be obtained through garden install matplotlib
+# Might fancy just linking the repository to make deployment less of a clusterfudge.
+from kivy.garden.matplotlib import FigureCanvasKivyAgg
+
+#=============================
+# Internal.
+from lib.azirolib.debugging import dprint
+import simplecryptopiascanner as scanner
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+#==========================================================
+# GUI Classes
+#==========================================================
+
+class Graph(kivy.uix.boxlayout.BoxLayout):
+	
+	"""A live candle chart of a market, embedded through FigureCanvasKivyAgg.
+	
+	Sealed candles are drawn as two collections (wicks and bodies), the newest candle as
+	separate, animated artists. Updates which only change the newest candle redraw just that
+	candle on top of a cached background (blitting). Only a new candle beginning, or the
+	newest one leaving the visible price range, causes the whole figure to be redrawn.
+	
+	Indicator overlays, such as moving averages, are lines over the candles. As their last
+	point moves with the newest candle, they're animated artists, blitted along with it."""
+	
+	colorUp = "#77d879"
+	colorDown = "#db3f3f"
+	overlayColors = ["#f0c030", "#4aa0e0", "#c070e0", "#e08040", "#40d0c0"]
+	
+	def __init__(self, title="", **kwargs):
+		super().__init__(**kwargs)
+		self.figure = pyplot.Figure()
+		self.plot = self.figure.add_subplot(1, 1, 1)
+		self.plot.set_facecolor("#000000")
+		self.plot.set_title(title)
+		self.plot.grid(True)
+		self.plot.xaxis.set_major_formatter(pyplot.FuncFormatter(\
+			lambda timestamp, position: scanner.Datetime(int(timestamp)).strftime("%H:%M")))
+		self.wicks = LineCollection([], linewidths=1)
+		self.bodies = PolyCollection([])
+		self.plot.add_collection(self.wicks)
+		self.plot.add_collection(self.bodies)
+		self.newestWick = Line2D([], [], linewidth=1, animated=True)
+		self.newestBody = Rectangle((0, 0), 0, 0, animated=True)
+		self.plot.add_line(self.newestWick)
+		self.plot.add_patch(self.newestBody)
+		# One line per overlay, made as they're first needed.
+		self.overlayLines = []
+		self.figureCanvas = FigureCanvasKivyAgg(self.figure)
+		self.figureCanvas.mpl_connect("draw_event", self._onDraw)
+		self.add_widget(self.figureCanvas)
+		self._background = None
+		self._newestBegin = None
+	
+	def update(self, candles, overlays=()):
+		"""Shows the specified Candles, the last of which is the newest, unsealed one, with
+		overlays, a list of arrays of values for the candles, each drawn as a line."""
+		if len(candles) == 0:
+			return
+		self._setOverlays(candles, overlays)
+		interval = candles.interval
+		begin = int(candles.begins[-1])
+		openPrice, high, low, close =\
+			candles.opens[-1], candles.highs[-1], candles.lows[-1], candles.closes[-1]
+		color = self.colorUp if close >= openPrice else self.colorDown
+		self.newestWick.set_data([begin + interval/2]*2, [low, high])
+		self.newestWick.set_color(color)
+		self.newestBody.set_bounds(begin + interval*0.1, min(openPrice, close),\
+			interval*0.8, abs(close-openPrice))
+		self.newestBody.set_color(color)
+		bottom, top = self.plot.get_ylim()
+		if not begin == self._newestBegin or low < bottom or high > top:
+			self._newestBegin = begin
+			self._drawSealed(candles[:-1])
+			self.plot.set_xlim(int(candles.begins[0]), begin + interval)
+			# Overlays are NaN where they have too few candles yet.
+			values = np.concatenate([candles.lows, candles.highs] + [np.asarray(overlay) for overlay in overlays])
+			lowest, highest = np.nanmin(values), np.nanmax(values)
+			padding = (highest - lowest) * 0.05
+			self.plot.set_ylim(lowest - padding, highest + padding)
+			self.figureCanvas.draw_idle()
+		elif self._background is None:
+			self.figureCanvas.draw_idle()
+		else:
+			self.figureCanvas.restore_region(self._background)
+			self._blitNewest()
+	
+	def _drawSealed(self, candles):
+		interval = candles.interval
+		centers = candles.begins + interval/2
+		lefts = candles.begins + interval*0.1
+		rights = candles.begins + interval*0.9
+		bottoms = np.minimum(candles.opens, candles.closes)
+		tops = np.maximum(candles.opens, candles.closes)
+		colors = np.where(candles.closes >= candles.opens, self.colorUp, self.colorDown)
+		self.wicks.set_segments(np.stack((np.column_stack((centers, candles.lows)),\
+			np.column_stack((centers, candles.highs))), axis=1))
+		self.wicks.set_color(colors)
+		self.bodies.set_verts(np.stack((np.column_stack((lefts, bottoms)), np.column_stack((lefts, tops)),\
+			np.column_stack((rights, tops)), np.column_stack((rights, bottoms))), axis=1))
+		self.bodies.set_facecolor(colors)
+		self.bodies.set_edgecolor(colors)
+	
+	def _setOverlays(self, candles, overlays):
+		while len(self.overlayLines) < len(overlays):
+			line = Line2D([], [], linewidth=1, animated=True,\
+				color=self.overlayColors[len(self.overlayLines) % len(self.overlayColors)])
+			self.plot.add_line(line)
+			self.overlayLines.append(line)
+		centers = candles.begins + candles.interval/2
+		for index, line in enumerate(self.overlayLines):
+			if index < len(overlays):
+				line.set_data(centers, overlays[index])
+			else:
+				line.set_data([], [])
+	
+	def _onDraw(self, event):
+		"""After every full draw, keep the background without the newest candle, then add it."""
+		self._background = self.figureCanvas.copy_from_bbox(self.plot.bbox)
+		self._blitNewest()
+	
+	def _blitNewest(self):
+		for line in self.overlayLines:
+			self.plot.draw_artist(line)
+		self.plot.draw_artist(self.newestWick)
+		self.plot.draw_artist(self.newestBody)
+		self.figureCanvas.blit(self.plot.bbox)
+
+class Gui(kivy.app.App):
+	
+	"""Live scanner view with a candle chart per symbol, refreshed every updateInterval seconds.
+	
+	Fetching and aggregating run on a worker thread: The Data objects (in binary mode) and a
+	CandleAggregator per symbol live there, and only finished Candles are handed over to the
+	UI thread for display, along with the overlays of the charts. Those are computed there
+	as well, by an IndicatorCache shared by all markets. The aggregators begin with the
+	stored trades of the shown candles, rather than all of them.
+	
+	Parameters:
+		
+		symbols (list): Default: scanner.symbols
+			The markets to show.
+		
+		interval (int): Default: 900
+			Length of the candles in seconds.
+		
+		maxCandles (int): Default: 96
+			How many candles to show per chart.
+		
+		updateInterval (int): Default: scanner.defaultUpdateInterval
+			Seconds between refreshes.
+		
+		storeDirPath (str): Default: scanner.defaultMarketscannersDirPath
+			Where the caches of the markets are kept.
+		
+		adapter (ExchangeAdapter or None): Default: None
+			The exchange (or files) the markets are read from. None for a CryptopiaAdapter.
+		
+		overlays (list): Default: 20 candle EMA and Bollinger bands
+			Indicators drawn over the candles, as (name, parameters) tuples, where name is
+			one of scanner.indicators on the price scale (like "sma", "ema", "vwap" or
+			"bollingerBands") and parameters is a dict of the keyword arguments it takes."""
+	
+	defaultOverlays = (("ema", {"period": 20}), ("bollingerBands", {"period": 20}))
+	
+	def __init__(self, symbols=scanner.symbols, interval=900, maxCandles=96,\
+	updateInterval=scanner.defaultUpdateInterval, storeDirPath=scanner.defaultMarketscannersDirPath,\
+	adapter=None, overlays=defaultOverlays, **kwargs):
+		super().__init__(**kwargs)
+		self.symbols = symbols
+		self.interval = interval
+		self.maxCandles = maxCandles
+		self.updateInterval = updateInterval
+		self.storeDirPath = storeDirPath
+		self.adapter = adapter if not adapter is None else scanner.CryptopiaAdapter()
+		self.overlays = list(overlays)
+		self.graphs = {}
+		self._worker = ThreadPoolExecutor(max_workers=1)
+		self._pendingRefresh = None
+		# Only ever touched by the worker thread.
+		self._datas = None
+		self._aggregators = {}
+		self._aggregatedCounts = {}
+		self._indicatorCache = scanner.IndicatorCache()
+	
+	def build(self):
+		root = kivy.uix.gridlayout.GridLayout(cols=int(np.ceil(np.sqrt(len(self.symbols)))) or 1)
+		for symbol in self.symbols:
+			self.graphs[symbol] = Graph(title=symbol)
+			root.add_widget(self.graphs[symbol])
+		Clock.schedule_once(self.refresh, 0)
+		Clock.schedule_interval(self.refresh, self.updateInterval)
+		return root
+	
+	def refresh(self, timePassed=None):
+		"""Have the worker thread refresh the markets, unless it's still busy with the last refresh."""
+		if not self._pendingRefresh is None and not self._pendingRefresh.done():
+			return
+		self._pendingRefresh = self._worker.submit(self._aggregate)
+		# Clock is safe to use from other threads, and calls back on the UI thread.
+		self._pendingRefresh.add_done_callback(\
+			lambda future: Clock.schedule_once(lambda timePassed: self._show(future)))
+	
+	def _aggregate(self):
+		"""Runs on the worker thread. Returns the candles of every symbol, along with the
+		values of their overlays."""
+		if self._datas is None:
+			self._datas = {symbol: scanner.Data(\
+				symbol=symbol,\
+				storePath=os.path.join(self.storeDirPath, symbol),\
+				updateInterval=self.updateInterval,\
+				startFresh=False,\
+				binary=True,\
+				adapter=self.adapter) for symbol in self.symbols}
+			for symbol in self.symbols:
+				self._aggregators[symbol] = scanner.CandleAggregator(intervals=(self.interval,), maxSealed=self.maxCandles)
+				# Made a count on the first refresh, once the stores are up to date.
+				self._aggregatedCounts[symbol] = None
+		for failedData, error in scanner.refreshAll(list(self._datas.values())).items():
+			dprint("Couldn't refresh {address}: {error}".format(address=failedData.address, error=error))
+		candles = {}
+		for symbol, data in self._datas.items():
+			if self._aggregatedCounts[symbol] is None:
+				self._aggregatedCounts[symbol] = self._firstShownTrade(data)
+			# The store only ever grows, so whatever is past what we've aggregated is new.
+			self._aggregators[symbol].addTrades(data.trades[self._aggregatedCounts[symbol]:])
+			self._aggregatedCounts[symbol] = len(data.trades)
+			symbolCandles = self._aggregators[symbol].candles(self.interval)
+			overlays = []
+			for name, parameters in self.overlays:
+				values = self._indicatorCache.get(symbol, symbolCandles, name, **parameters)
+				overlays.extend(values if isinstance(values, tuple) else [values])
+			candles[symbol] = (symbolCandles, overlays)
+		return candles
+	
+	def _firstShownTrade(self, data):
+		"""Index of the first stored trade of the candles shown, so that the aggregator isn't
+		fed all of the history just for those."""
+		if len(data.trades) == 0:
+			return 0
+		newestBegin = scanner.floorTimestamp(int(data.trades.timestamps[-1]), self.interval)
+		return data.tradeStore.searchsorted(newestBegin - self.maxCandles*self.interval)
+	
+	def _show(self, future):
+		try:
+			candles = future.result()
+		except Exception as error:
+			dprint("Refreshing failed: {0!r}".format(error))
+			return
+		for symbol, (symbolCandles, overlays) in candles.items():
+			self.graphs[symbol].update(symbolCandles, overlays)
+	
+	def on_stop(self):
+		self._worker.shutdown(wait=False)
+
+#=======================================================================================
+# Action
+#=======================================================================================
+
+if __name__ == "__main__":
+	Gui().run()
@@ -57,7 +57,8 @@ class TestingArguments(Arguments):
 	def setUp(self):
 		
 		""" We take a single argument besides argparse's defaults: Name of the testing module to load.
-		Upon calling --help, we'll also list all the available modules from the testing directory."""
+		Upon calling --help, we'll also list all the available modules from the testing directory.
+		Optionally, the testing can be run under cProfile or tracemalloc, or with metrics enabled."""
 		
 		# Absolute path to our script.
 		excDirPath = os.path.join(Path(__file__).absolute().parent.as_posix())
@@ -75,6 +76,55 @@ class TestingArguments(Arguments):
 					)
 				)
 			)
+		self.parser.add_argument(\
+			"--profile", nargs="?", const="", metavar="PATH",\
+			help="Run the testing under cProfile and print the functions taking the most time."\
+				" If PATH is specified, the stats are also saved there, e.g. for snakeviz.")
+		self.parser.add_argument(\
+			"--tracemalloc", action="store_true",\
+			help="Trace memory allocations during the testing and print where most memory was"\
+				" allocated, and the peak.")
+		self.parser.add_argument(\
+			"--metrics", action="store_true",\
+			help="Enable the metrics of the subject and print them after the testing.")
+
+#=============================
+# Capture
+#=============================
+
+reportedLinesCount = 25
+
+def runCaptured(run, profilePath=None, traceMemory=False):
+	"""Calls run, under cProfile if profilePath isn't None ("" for not saving the stats) and
+	with tracemalloc tracing if traceMemory, and prints what they captured."""
+	if traceMemory:
+		import tracemalloc
+		tracemalloc.start()
+	if not profilePath == None:
+		import cProfile
+		import pstats
+		profile = cProfile.Profile()
+		profile.enable()
+	try:
+		run()
+	finally:
+		# Both stop before either reports, so they don't capture each other.
+		if not profilePath == None:
+			profile.disable()
+		if traceMemory:
+			snapshot = tracemalloc.take_snapshot()
+			current, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+		if not profilePath == None:
+			if not profilePath == "":
+				profile.dump_stats(profilePath)
+			pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(reportedLinesCount)
+		if traceMemory:
+			print("Allocated memory still in use, by line:", file=sys.stderr)
+			for statistic in snapshot.statistics("lineno")[:reportedLinesCount]:
+				print("\t{0}".format(statistic), file=sys.stderr)
+			print("Current: {current:.1f}MiB, peak: {peak:.1f}MiB"\
+				.format(current=current/2**20, peak=peak/2**20), file=sys.stderr)
 
 #=======================================================================================
 # Action
@@ -84,7 +134,12 @@ if __name__ == "__main__":
 	
 	args = TestingArguments().get()
 	import simplecryptopiascanner
+	simplecryptopiascanner.metrics.enabled = args.metrics
 
 	chosenModule = __import__(name="testings.{moduleName}".format(moduleName=args.module),\
 		globals=globals(), locals=locals(), fromlist=[args.module], level=0)
-	chosenModule.Testing().run()
\ No newline at end of file
+	try:
+		runCaptured(chosenModule.Testing().run, profilePath=args.profile, traceMemory=args.tracemalloc)
+	finally:
+		if args.metrics:
+			print(simplecryptopiascanner.metrics.report(), file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+import time
+import json
+
+# Third party.
+import numpy as np
+
+# A special variable SUBJECT is assigned to the module we're performing testings on.
+# Chances are stuff in this section depends on module paths spoofed by the
+# "testing" script upon importing this here testing module.
+import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
+backfillDirPath = os.path.join(defaultMarketscannersDirPath, "backfill")
+tradesCount = 2000000
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+def makeDump(path, count):
+	"""Writes a CSV dump of count random trades, in the format BackfillImporter takes."""
+	random = np.random.default_rng(0)
+	timestamps = 1500000000 + np.cumsum(random.integers(0, 3, count))
+	prices = random.random(count)
+	amounts = random.random(count) * 100
+	sides = random.choice(["buy", "sell"], count)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "w") as dumpFile:
+		dumpFile.write("timestamp,price,amount,total,side\n")
+		for timestamp, price, amount, side in zip(timestamps.tolist(), prices.tolist(), amounts.tolist(), sides):
+			dumpFile.write("{0},{1!r},{2!r},{3!r},{4}\n".format(timestamp, price, amount, price*amount, side))
+
+def makeJsonDump(path, csvPath):
+	"""Writes the trades of the CSV dump as a GetMarketHistory response."""
+	columns = SUBJECT.BackfillImporter().read(csvPath)
+	with open(path, "w") as dumpFile:
+		json.dump({"Success": True, "Data": [{"Type": "Buy" if trade.side == 1 else "Sell",\
+			"Price": trade.price, "Amount": trade.amount, "Total": trade.total, "Timestamp": trade.timestamp}\
+			for trade in reversed(list(columns))]}, dumpFile)
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+	def run(self):
+		csvPath = os.path.join(backfillDirPath, "sample.csv")
+		jsonPath = os.path.join(backfillDirPath, "sample.json")
+		if not os.path.isfile(csvPath):
+			print("Writing {count} trades to {path}.".format(count=tradesCount, path=csvPath))
+			makeDump(csvPath, tradesCount)
+		if not os.path.isfile(jsonPath):
+			makeJsonDump(jsonPath, csvPath)
+
+		start = time.perf_counter()
+		with open(jsonPath, "r") as dumpFile:
+			SUBJECT.MarketHistory.tradeColumnsFromList(json.load(dumpFile)["Data"])
+		print("json.load and TradeColumns: {0:.2f}s".format(time.perf_counter()-start))
+
+		for processes in sorted(set([1, os.cpu_count() or 1])):
+			start = time.perf_counter()
+			columns = SUBJECT.BackfillImporter(processes=processes).read(csvPath)
+			print("BackfillImporter, {processes} process(es): {time:.2f}s for {count} trades"\
+				.format(processes=processes, time=time.perf_counter()-start, count=len(columns)))
+
+		store = SUBJECT.TradeStore(os.path.join(backfillDirPath, "sample.trades"))
+		start = time.perf_counter()
+		imported = SUBJECT.BackfillImporter().importInto(csvPath, store)
+		print("Imported {imported} new trades into {path} in {time:.2f}s ({count} stored)."\
+			.format(imported=imported, path=store.path, time=time.perf_counter()-start, count=store.count))
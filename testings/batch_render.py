@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+
+# Stuff particular to our testings.
+from testings.utils.visualization import renderCharts
+
+# A special variable SUBJECT is assigned to the module we're performing testings on.
+# Chances are stuff in this section depends on module paths spoofed by the
+# "testing" script upon importing this here testing module.
+import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+symbols = ["NEBL"]
+intervals = {"15m": 15*60, "1h": 3600, "1d": 86400} # Name in file names: Length in seconds.
+formats = ["png"] # Also possible: "svg", "pdf" and whatever else matplotlib's savefig knows.
+defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
+chartsDirPath = os.path.join(defaultMarketscannersDirPath, "charts")
+defaultUpdateInterval = 360 # In seconds.
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+	
+	"""Renders candle charts of every symbol and interval to chartsDirPath, without a display.
+	Meant for daily reports, e.g. from cron."""
+	
+	def run(self):
+		datas = {}
+		for symbol in symbols:
+			datas[symbol] = SUBJECT.Data(\
+				symbol=symbol,\
+				storePath=os.path.join(defaultMarketscannersDirPath, "{0}".format(symbol)),\
+				updateInterval=defaultUpdateInterval,\
+				startFresh=False)
+		for failedData, error in SUBJECT.refreshAll(list(datas.values())).items():
+			print("Couldn't refresh {address}: {error}".format(address=failedData.address, error=error))
+		
+		os.makedirs(chartsDirPath, exist_ok=True)
+		jobs = []
+		for symbol, data in datas.items():
+			if len(data.dict.get("Data", [])) == 0:
+				continue
+			history = SUBJECT.MarketHistory(data.dict["Data"])
+			for intervalName, seconds in intervals.items():
+				candles = history.candles(seconds)
+				ohlc = candles.toDataFrame()
+				for fileFormat in formats:
+					jobs.append((ohlc,\
+						os.path.join(chartsDirPath, "{symbol}_{interval}.{format}"\
+							.format(symbol=symbol, interval=intervalName, format=fileFormat)),\
+						"Cryptopia: {symbol} ({interval})".format(symbol=symbol, interval=intervalName)))
+		
+		for path in renderCharts(jobs):
+			print(path)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from pathlib import Path
+from timeit import default_timer as now
+
+# Third party.
+import numpy as np
+
+# A special variable SUBJECT is assigned to the module we're performing testings on.
+# Chances are stuff in this section depends on module paths spoofed by the
+# "testing" script upon importing this here testing module.
+import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
+
+# The toy problems aren't a package; fizzbuzz imports the lib from next to it, too.
+sys.path.insert(0, os.path.join(Path(__file__).absolute().parent.parent.as_posix(), "toyproblems"))
+from toylib import Bench
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
+benchmarksDirPath = os.path.join(defaultMarketscannersDirPath, "benchmarks")
+tradesCounts = [10000, 1000000, 10000000] # Sizes of the synthetic market histories.
+if "BENCHMARK_TRADES" in os.environ: # Comma separated, e.g. BENCHMARK_TRADES=10000,100000
+	tradesCounts = [int(count) for count in os.environ["BENCHMARK_TRADES"].split(",")]
+# Benchmarks making a Python object per trade or second (JSON, in1Seconds) are skipped for
+# histories larger than this, as they'd need more memory than most machines have.
+maxObjectsTradesCount = 1000000
+rollupIntervals = [60, 300, 900, 3600, 86400]
+iterations = 5
+# Medians slower than this factor of those of the previous results get flagged.
+regressionFactor = 1.2
+# Medians shorter than this (in seconds) are mostly noise, so they're not compared.
+minimumComparedTime = 0.01
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+def makeColumns(count):
+	"""TradeColumns of count random trades, about one per second."""
+	random = np.random.default_rng(0)
+	timestamps = 1500000000 + np.cumsum(random.integers(0, 3, count))
+	prices = random.random(count)
+	amounts = random.random(count) * 100
+	return SUBJECT.TradeColumns(timestamps, prices, amounts, prices*amounts,\
+		random.choice(np.array([1, -1], dtype=np.int8), count), presorted=True)
+
+def makeCache(storePath, columns):
+	"""Writes the trades as the GetMarketHistory response Data caches, newest first."""
+	trades = [{"Type": "Buy" if side == 1 else "Sell", "Price": price, "Amount": amount, "Total": total,\
+		"Timestamp": timestamp} for timestamp, price, amount, total, side in zip(columns.timestamps.tolist(),\
+			columns.prices.tolist(), columns.amounts.tolist(), columns.totals.tolist(), columns.sides.tolist())]
+	trades.reverse()
+	with open(storePath, "w") as cacheFile:
+		json.dump({"Success": True, "Data": trades}, cacheFile)
+
+def benchmark(name):
+	"""Names a function for Bench, which reports functions by name."""
+	def named(problem):
+		problem.__name__ = name
+		return problem
+	return named
+
+def revision():
+	"""The git revision of the repository, or None if it's not available."""
+	try:
+		return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).absolute().parent.parent.as_posix(),\
+			stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def problemsFor(count):
+	"""The functions to benchmark on a synthetic history of count trades, for Bench."""
+	columns = makeColumns(count)
+	problems = []
+
+	# A fresh MarketHistory every time, as it caches what it computes.
+	@benchmark("in1Seconds")
+	def in1Seconds():
+		history = SUBJECT.MarketHistory(columns)
+		start = now()
+		history.in1Seconds
+		return start, now()
+
+	@benchmark("in1Minutes")
+	def in1Minutes():
+		history = SUBJECT.MarketHistory(columns)
+		start = now()
+		history.in1Minutes
+		return start, now()
+
+	@benchmark("candleRollups")
+	def candleRollups():
+		history = SUBJECT.MarketHistory(columns)
+		start = now()
+		for seconds in rollupIntervals:
+			history.candles(seconds)
+		return start, now()
+
+	@benchmark("windowRollups")
+	def windowRollups():
+		history = SUBJECT.MarketHistory(columns)
+		start = now()
+		for seconds in rollupIntervals:
+			history.inInterval(seconds)
+		return start, now()
+
+	if count <= maxObjectsTradesCount:
+		problems.append(in1Seconds)
+	problems.extend([in1Minutes, candleRollups, windowRollups])
+
+	sizeDirPath = os.path.join(benchmarksDirPath, str(count))
+	os.makedirs(sizeDirPath, exist_ok=True)
+	storePath = os.path.join(sizeDirPath, "cache")
+
+	if count <= maxObjectsTradesCount:
+		if not os.path.isfile(storePath):
+			makeCache(storePath, columns)
+		jsonData = SUBJECT.Data(symbol="BENCHMARK", storePath=storePath, startFresh=False)
+
+		@benchmark("Data._initData (JSON)")
+		def initJsonData():
+			start = now()
+			jsonData._initData()
+			return start, now()
+
+		problems.append(initJsonData)
+
+	store = SUBJECT.TradeStore("{0}.trades".format(storePath))
+	if not store.count == count:
+		if store.exists:
+			os.remove(store.path)
+		store.appendNew(columns)
+	binaryData = SUBJECT.Data(symbol="BENCHMARK", storePath=storePath, startFresh=False, binary=True)
+
+	@benchmark("Data._initData (binary)")
+	def initBinaryData():
+		start = now()
+		binaryData._initData()
+		return start, now()
+
+	problems.append(initBinaryData)
+
+	try:
+		from testings.utils.visualization import OhlcGraph
+		pohlc = SUBJECT.MarketHistory(columns).candles(60).toDataFrame()
+	except ImportError as error:
+		print("Skipping pohlcToMohlc: {0}".format(error))
+	else:
+		@benchmark("pohlcToMohlc")
+		def pohlcToMohlc():
+			start = now()
+			OhlcGraph.pohlcToMohlc(pohlc)
+			return start, now()
+
+		problems.append(pohlcToMohlc)
+	return problems
+
+def previousResults(exceptPath):
+	"""The newest results file other than exceptPath, loaded, or None if there's none."""
+	paths = sorted(path for path in Path(benchmarksDirPath).glob("results-*.json") if not str(path) == exceptPath)
+	if len(paths) == 0:
+		return None
+	with open(str(paths[-1]), "r") as resultsFile:
+		return json.load(resultsFile)
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+
+	"""Benchmarks aggregation and ingest on synthetic histories of every size in tradesCounts.
+	Results go to a results-<time>.json file in benchmarksDirPath, and medians are compared
+	with those of the newest results file before it."""
+
+	def run(self):
+		os.makedirs(benchmarksDirPath, exist_ok=True)
+		results = {"time": int(time.time()), "revision": revision(), "python": platform.python_version(),\
+			"numpy": np.__version__, "iterations": iterations, "results": []}
+		for count in tradesCounts:
+			bench = Bench(problemsFor(count), iterations=iterations, quiet=True, measureMemory=True)
+			for result in bench.results:
+				del result["factor"] # Relative to whatever ran first, which is meaningless here.
+				result["trades"] = count
+				results["results"].append(result)
+				print("{trades:>9} trades {problem:<24} min {min:9.4f}s  median {median:9.4f}s"\
+					"  p95 {p95:9.4f}s  peak {memory:8.1f}MiB"\
+					.format(memory=result["peakMemory"]/2**20, **result))
+
+		path = os.path.join(benchmarksDirPath, "results-{0}.json".format(results["time"]))
+		with open(path, "w") as resultsFile:
+			json.dump(results, resultsFile, indent="\t")
+		print("Results written to {0}.".format(path))
+
+		previous = previousResults(path)
+		if previous is None:
+			return
+		print("Compared with {revision} (median, new/old):".format(revision=previous["revision"]))
+		previousMedians = dict(((result["trades"], result["problem"]), result["median"])\
+			for result in previous["results"])
+		for result in results["results"]:
+			previousMedian = previousMedians.get((result["trades"], result["problem"]))
+			if not previousMedian or max(previousMedian, result["median"]) < minimumComparedTime:
+				continue
+			factor = result["median"] / previousMedian
+			print("{flag:<11}{trades:>9} trades {problem:<24} {factor:6.2f}x".format(\
+				flag="REGRESSION" if factor > regressionFactor else "", factor=factor, **result))
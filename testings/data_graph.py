@@ -10,10 +10,6 @@
 # Builtins.
 import os
 
-# Third party.
-import arrow
-import pandas as pd
-
 # Stuff particular to our testings.
 from testings.utils.visualization import OhlcGraph
 
@@ -29,6 +25,7 @@ import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
 symbols = ["NEBL"]
 defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
 defaultUpdateInterval = 360 # In seconds.
+shownSeconds = None # How far back from the newest trade to draw, e.g. 86400 for a day; None for all.
 
 #=======================================================================================
 # Library
@@ -37,35 +34,29 @@ defaultUpdateInterval = 360 # In seconds.
 # This class gets instantiated by the "testing" script right after importing this module.
 class Testing(object):
 	def run(self):
+		datas = []
 		for symbol in symbols:
 			data = SUBJECT.Data(\
-				address="https://www.cryptopia.co.nz/api/GetMarketHistory/{symbol}_BTC/"\
-					.format(symbol=symbol),\
+				symbol=symbol,\
 				storePath=os.path.join(defaultMarketscannersDirPath, "{0}".format(symbol)),\
 				updateInterval=defaultUpdateInterval,\
-				startFresh=True) #NOTE: startFresh=False for debugging purposes.
+				startFresh=False) # Refreshed all at once below.
+			datas.append(data)
+		# Comment out for debugging purposes, to stick to the cache.
+		for failedData, error in SUBJECT.refreshAll(datas).items():
+			print("Couldn't refresh {address}: {error}".format(address=failedData.address, error=error))
 		
 		#=============================
 		# Testing & Debugging
 		#=============================
 		
-		startTimestamp = data.dict["Data"][len(data.dict["Data"])-1]["Timestamp"]
-		endTimestamp = data.dict["Data"][0]["Timestamp"]
-		start = arrow.Arrow.fromtimestamp(startTimestamp)
-		end = arrow.Arrow.fromtimestamp(endTimestamp)
-		
-		dateRange = pd.date_range(\
-			start=start.format(),\
-			end=end.format(),\
-			freq="min")
-		
-		dataFrame = pd.DataFrame(data.dict["Data"])
-		dataFrame["Timestamp"] = dataFrame["Timestamp"].apply(pd.to_datetime, unit="s")
-		#dprint(dataFrame["Timestamp"])
-		#sys.exit()
-		dataFrame = dataFrame.set_index("Timestamp")
+		history = SUBJECT.MarketHistory(data.dict["Data"])
+		timestamps = history.tradeColumns.timestamps
 		
-		ohlc = dataFrame["Price"].resample("15min").ohlc()
+		# Only the candles of the shown time range are aggregated.
+		shownBegin = None if shownSeconds == None else int(timestamps[-1]) + 1 - shownSeconds
+		candles = history.candlesBetween(15*60, shownBegin)
+		ohlc = candles.toDataFrame()
 		#for index in ohlc.index:
 		#	dprint(index)
 		
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+subjectModuleName = "simplecryptopiascanner"
+# None of these may be imported by merely importing the subject. They're what the GUI, the
+# plotting, backfilling, signal scans and the command line need, which headless use (e.g.
+# fetching from cron) shouldn't pay for.
+forbiddenModuleNames = ["kivy", "matplotlib", "pandas", "multiprocessing", "csv", "argparse"]
+importTimeBudget = 0.4 # In seconds, the best of all runs.
+runs = 5
+reportedImportsCount = 10
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+def measureImport(moduleName):
+	"""Imports the module in a fresh interpreter with -X importtime.
+	Returns the list of (cumulative microseconds, name) of the imports it caused and
+	the names of the top level packages it left in sys.modules."""
+	repositoryDirPath = Path(__file__).absolute().parent.parent.as_posix()
+	environment = dict(os.environ)
+	environment["PYTHONPATH"] = os.pathsep.join(\
+		[repositoryDirPath] + [path for path in environment.get("PYTHONPATH", "").split(os.pathsep) if path])
+	process = subprocess.run(\
+		[sys.executable, "-X", "importtime", "-c",\
+			"import sys, {0}; print(' '.join(sorted(set(name.partition('.')[0] for name in sys.modules))))"\
+				.format(moduleName)],\
+		cwd=repositoryDirPath, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE,\
+		universal_newlines=True, check=True)
+	imports = []
+	for line in process.stderr.splitlines():
+		# Format: "import time: <self us> | <cumulative us> | <indented name>"
+		if not line.startswith("import time:") or line.endswith("imported package"):
+			continue
+		selfTime, cumulativeTime, name = line[len("import time:"):].split("|")
+		imports.append((int(cumulativeTime), name.rstrip()))
+	return imports, process.stdout.split()
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+	def run(self):
+		measurements = [measureImport(subjectModuleName) for run in range(runs)]
+		imports, loadedModuleNames = min(measurements,\
+			key=lambda measurement: dict((name.strip(), time) for time, name in measurement[0])[subjectModuleName])
+		totalTime = dict((name.strip(), time) for time, name in imports)[subjectModuleName] / 1e6
+
+		print("Importing {module}: {time:.3f}s (best of {runs}, budget: {budget:.3f}s)"\
+			.format(module=subjectModuleName, time=totalTime, runs=runs, budget=importTimeBudget))
+		print("Slowest direct imports:")
+		# Names are indented by two spaces per level, after the one separating them from the "|".
+		directImports = [(time, name) for time, name in imports if len(name) - len(name.lstrip()) == 3]
+		for time, name in sorted(directImports, reverse=True)[:reportedImportsCount]:
+			print("\t{time:8.3f}s {name}".format(time=time/1e6, name=name.strip()))
+
+		problems = []
+		for forbiddenModuleName in forbiddenModuleNames:
+			if forbiddenModuleName in loadedModuleNames:
+				problems.append("{0} got imported.".format(forbiddenModuleName))
+		if totalTime > importTimeBudget:
+			problems.append("Import took longer than the budget.")
+		for problem in problems:
+			print("REGRESSION: {0}".format(problem))
+		if problems:
+			sys.exit(1)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+
+# A special variable SUBJECT is assigned to the module we're performing testings on.
+# Chances are stuff in this section depends on module paths spoofed by the
+# "testing" script upon importing this here testing module.
+import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+symbols = ["NEBL"]
+defaultMarketscannersDirPath=os.path.join(os.path.expanduser("~"), ".cache", "simplecryptopiascanner")
+defaultUpdateInterval = 360 # In seconds.
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+	def run(self):
+		SUBJECT.Gui(\
+			symbols=symbols,\
+			interval=15*60,\
+			updateInterval=defaultUpdateInterval,\
+			storeDirPath=defaultMarketscannersDirPath).run()
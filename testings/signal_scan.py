@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+#==========================================================
+#=============================
+
+# Builtins.
+import os
+import time
+
+# Third party.
+import numpy as np
+
+# A special variable SUBJECT is assigned to the module we're performing testings on.
+# Chances are stuff in this section depends on module paths spoofed by the
+# "testing" script upon importing this here testing module.
+import simplecryptopiascanner as SUBJECT # This is the subject of our testings.
+
+#=======================================================================================
+# Configuration
+#=======================================================================================
+
+marketsCount = 500
+tradesPerMarket = 20000
+interval = 300
+reportedHitsCount = 5
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+def makeCandles(random, count):
+	"""Candles of count random trades, a random walk with the occasional burst."""
+	timestamps = 1500000000 + np.cumsum(random.integers(0, 30, count))
+	prices = np.exp(np.cumsum(random.normal(0, 0.002, count)))
+	amounts = random.random(count) * 100
+	amounts[-random.integers(1, 50):] *= random.choice([1, 10])
+	sides = random.integers(1, 3, count)
+	return SUBJECT.TradeColumns(timestamps, prices, amounts, prices*amounts, sides, presorted=True)\
+		.candles(interval)
+
+# This class gets instantiated by the "testing" script right after importing this module.
+class Testing(object):
+	def run(self):
+		random = np.random.default_rng(0)
+		candlesOfMarkets = dict(("MARKET{0}".format(market), makeCandles(random, tradesPerMarket))\
+			for market in range(marketsCount))
+		rules = [SUBJECT.PriceBreakout(), SUBJECT.VolumeMultiple(), SUBJECT.RsiExtreme()]
+
+		for processes in sorted(set([1, os.cpu_count() or 1])):
+			scanner = SUBJECT.SignalScanner(rules, processes=processes, minimumParallelCandles=0)
+			start = time.perf_counter()
+			hits = scanner.scan(candlesOfMarkets)
+			print("{markets} markets, {processes} process(es): {time:.2f}s, {hits} hits (update interval: {update}s)"\
+				.format(markets=marketsCount, processes=processes, time=time.perf_counter()-start,\
+					hits=len(hits), update=SUBJECT.defaultUpdateInterval))
+
+		for rule in rules:
+			print("Top {0} hits:".format(rule.name))
+			for hit in [hit for hit in hits if hit.rule == rule.name][:reportedHitsCount]:
+				print("\t{hit.market:12} {hit.score:10.4f} close: {hit.close:.8f}".format(hit=hit))
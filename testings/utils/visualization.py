@@ -6,7 +6,13 @@
 #==========================================================
 #=============================
 
+import datetime
+import multiprocessing
+
+import numpy as np
 from matplotlib import pyplot as mpl_pyplot
+from matplotlib import figure as mpl_figure
+from matplotlib.backends import backend_agg as mpl_backend_agg
 from matplotlib import dates as mpl_dates
 from matplotlib import ticker as mpl_ticker
 # Installed by: pip install https://github.com/matplotlib/mpl_finance/archive/master.zip
@@ -17,19 +23,28 @@ import mpl_finance
 #=======================================================================================
 
 class OhlcGraph(object):
-	def __init__(self, pandasOhlcObject, title=""):
+	
+	# Minimum width of a candle in pixels when decimating.
+	pixelsPerCandle = 3
+	
+	def __init__(self, pandasOhlcObject, title="", maxCandles=None):
 		"""Takes resample().ohlc data from a DataFrame and displays a graph window.
 		self.pohlc holds the data as provided in pandas ohlc form.
-		self.mohlc holds the transformed, matplotlib friendly form of the data."""
+		self.mohlc holds the transformed, matplotlib friendly form of the data.
+		
+		If there are more candles than fit the width of the figure (or maxCandles, if
+		specified), neighbouring candles are merged, so that long series still draw fast."""
 		
 		# This is just for wild testing purposes.
 		# Right now, I need something to visualize the data fast for debugging.
 		# This will (have to) do. Zero code quality guaranteed.
 		
 		self.pohlc = pandasOhlcObject
-		self.mohlc = self.pohlcToMohlc(self.pohlc)
 		self.figure = mpl_pyplot.figure()
 		self.plot = mpl_pyplot.subplot2grid((1,1,), (0,0))
+		if maxCandles == None:
+			maxCandles = int(self.figure.get_figwidth() * self.figure.dpi / self.pixelsPerCandle)
+		self.mohlc = self.decimate(self.pohlcToMohlc(self.pohlc), maxCandles)
 		#figure, self.plot = mpl_pyplot.subplots(figsize=(10,5))
 		
 		#=============================
@@ -47,33 +62,100 @@ class OhlcGraph(object):
 		#print(self.mohlc[0][3])
 		#print(self.mohlc[0])
 		
-		mpl_finance.candlestick_ohlc(ax=self.plot, quotes=self.mohlc, width=0.005,\
+		self.drawCandles(self.figure, self.plot, self.mohlc, title)
+		
+	@classmethod
+	def drawCandles(cls, figure, plot, mohlc, title=""):
+		"""Draws the candles of a mohlc array onto the plot (axes) of a figure, with our styling.
+		Only uses the figure and plot passed, so it's fine without pyplot, too."""
+		mpl_finance.candlestick_ohlc(ax=plot, quotes=mohlc, width=cls.candleWidth(mohlc),\
 			colorup="#77d879", colordown="#db3f3f")
 		
-		for label in self.plot.xaxis.get_ticklabels():
+		for label in plot.xaxis.get_ticklabels():
 			label.set_rotation(90)
 			
 		#mpl_pyplot.xticks(self.mohlc[0])
-		self.plot.xaxis.set_major_formatter(mpl_dates.DateFormatter("%Y-%m-%d"))
+		plot.xaxis.set_major_formatter(mpl_dates.DateFormatter("%Y-%m-%d"))
 		#self.plot.xaxis.set_major_locator(mpl_ticker.MaxNLocator(len(self.mohlc)))
-		self.plot.set_facecolor("#000000")
-		self.plot.grid(True)
+		plot.set_facecolor("#000000")
+		plot.grid(True)
 		
-		mpl_pyplot.xlabel("Date & Time")
-		mpl_pyplot.ylabel("Price")
-		mpl_pyplot.title(title)
-		mpl_pyplot.subplots_adjust(left=0.1, bottom=0.20, right=0.94, top=0.90, wspace=0.2, hspace=0)
-		mpl_pyplot.legend()
+		plot.set_xlabel("Date & Time")
+		plot.set_ylabel("Price")
+		plot.set_title(title)
+		figure.subplots_adjust(left=0.1, bottom=0.20, right=0.94, top=0.90, wspace=0.2, hspace=0)
 		
-	def pohlcToMohlc(self, pohlc):
-		"""Takes panda OHLC object (pohlc) and returns matplotlib friendly OHLC object (mohlc)."""
-		mohlc = []
-		row = 0
-		while row < len(pohlc.index):
-			mohlc.append((mpl_dates.date2num(pohlc.index[row]), pohlc.open[row], pohlc.high[row],\
-				pohlc.low[row], pohlc.close[row]))
-			row += 1
-		return mohlc
+	@staticmethod
+	def pohlcToMohlc(pohlc):
+		"""Takes panda OHLC object (pohlc) and returns matplotlib friendly OHLC object (mohlc):
+		An array with a (date number, open, high, low, close) row per candle."""
+		# Matplotlib date numbers are days since its epoch, which depends on its version.
+		epoch = mpl_dates.date2num(datetime.datetime(1970, 1, 1))
+		seconds = pohlc.index.values.astype("datetime64[s]").astype(np.float64)
+		return np.column_stack((epoch + seconds/86400, pohlc["open"].values, pohlc["high"].values,\
+			pohlc["low"].values, pohlc["close"].values))
+	
+	@staticmethod
+	def decimate(mohlc, maxCandles):
+		"""Merges runs of neighbouring candles of a mohlc array, so that there are no more than
+		maxCandles left. Each run starts at the date of its first candle."""
+		if len(mohlc) <= maxCandles or maxCandles < 1:
+			return mohlc
+		runLength = -(-len(mohlc) // maxCandles)
+		starts = np.arange(0, len(mohlc), runLength)
+		stops = np.append(starts[1:], len(mohlc))
+		return np.column_stack((mohlc[starts, 0], mohlc[starts, 1],\
+			np.maximum.reduceat(mohlc[:, 2], starts), np.minimum.reduceat(mohlc[:, 3], starts),\
+			mohlc[stops-1, 4]))
+	
+	@staticmethod
+	def candleWidth(mohlc):
+		"""Width of the candles in days: Most of the typical distance between two candles."""
+		if len(mohlc) < 2:
+			return 0.005
+		return float(np.median(np.diff(mohlc[:, 0]))) * 0.8
 	
 	def show(self):
 		mpl_pyplot.show()
+
+class OhlcChartRenderer(object):
+	
+	"""Renders OhlcGraph style candle charts to image files, without a display.
+	
+	Uses the Agg backend directly, rather than through pyplot, and draws every chart onto
+	the same figure, which is cleared in between."""
+	
+	def __init__(self, width=12, height=6, dpi=100):
+		self.figure = mpl_figure.Figure(figsize=(width, height), dpi=dpi)
+		self.canvas = mpl_backend_agg.FigureCanvasAgg(self.figure)
+		self.plot = self.figure.add_subplot(1, 1, 1)
+		self.maxCandles = int(width * dpi / OhlcGraph.pixelsPerCandle)
+		
+	def render(self, pandasOhlcObject, path, title=""):
+		"""Renders resample().ohlc style data to path. The format follows the file extension,
+		like ".png" or ".svg"."""
+		self.plot.clear()
+		mohlc = OhlcGraph.decimate(OhlcGraph.pohlcToMohlc(pandasOhlcObject), self.maxCandles)
+		OhlcGraph.drawCandles(self.figure, self.plot, mohlc, title)
+		self.figure.savefig(path)
+		return path
+
+# The renderer of a worker process of renderCharts, made once by its initializer.
+_workerRenderer = None
+
+def _initRenderWorker(width, height, dpi):
+	global _workerRenderer
+	_workerRenderer = OhlcChartRenderer(width=width, height=height, dpi=dpi)
+	
+def _renderJob(job):
+	pandasOhlcObject, path, title = job
+	return _workerRenderer.render(pandasOhlcObject, path, title)
+
+def renderCharts(jobs, processes=None, width=12, height=6, dpi=100):
+	"""Renders charts in parallel with a pool of worker processes, each reusing its own figure.
+	
+	jobs is a list of (pandasOhlcObject, path, title) tuples. Returns the paths of the rendered
+	charts in the order of the jobs. processes defaults to the number of CPUs."""
+	with multiprocessing.Pool(processes=processes, initializer=_initRenderWorker,\
+	initargs=(width, height, dpi)) as pool:
+		return pool.map(_renderJob, jobs, chunksize=1)
@@ -1,8 +1,12 @@
 from collections import namedtuple
 import inspect
+import math
+import statistics
 import time
+import tracemalloc
 
-Run = namedtuple("Run", ["problem", "factor", "time"])
+# time is the fastest of all iterations, peakMemory in bytes (None if not measured).
+Run = namedtuple("Run", ["problem", "factor", "time", "median", "p95", "peakMemory"])
 
 class Bench(object):
 	
@@ -15,6 +19,10 @@ class Bench(object):
 		[function name]
 			The factor as to how much faster or slower it ran than the initial function.
 			The fastest execution time of the function as determined by multiple iterations.
+			The median and 95th percentile of the execution times of all iterations.
+			The peak memory allocated while running the function, if measured.
+	
+	.results holds the same as a list of dicts, ready for json.dump.
 	
 	Parameters:
 		
@@ -42,10 +50,18 @@ class Bench(object):
 			
 		factorAsInt(bool): Default: False
 			Whether the factor is to be typecasted to int().
-			If True, will override factorRoundingPrecision."""
+			If True, will override factorRoundingPrecision.
+		
+		quiet (bool): Default: False
+			If True, no banners are printed around every iteration.
+		
+		measureMemory (bool): Default: False
+			If True, every function is run once more after the timed iterations, with
+			tracemalloc tracing, to determine the peak memory it allocates. That run
+			isn't timed, as tracing slows allocations down considerably."""
 	
 	def __init__(self, problems=[], run=True, iterations=10, howMuchFaster=True,\
-	factorRoundingPrecision=None, factorAsInt=False):
+	factorRoundingPrecision=None, factorAsInt=False, quiet=False, measureMemory=False):
 		
 		# Declarations & defaults.
 		self.runs = [] # List of Result type namedtuples.
@@ -59,6 +75,8 @@ class Bench(object):
 		self.howMuchFaster = howMuchFaster
 		self.factorRoundingPrecision = factorRoundingPrecision
 		self.factorAsInt = factorAsInt
+		self.quiet = quiet
+		self.measureMemory = measureMemory
 		self.factorStrings = {True: "Faster by", False: "Slower by"}
 		
 		# Run immediately if specified.
@@ -81,13 +99,27 @@ class Bench(object):
 	@property
 	def string(self):
 		return "\n".join(\
-			["[{problem}] \n\t{factorString}: {factor}\n\ttime: {time}"\
+			["[{problem}] \n\t{factorString}: {factor}\n\ttime: {time}\n\tmedian: {median}\n\tp95: {p95}{memory}"\
 				.format(problem=run.problem.__name__,\
 					factor=self.getRoundedFactor(run.factor),\
-					factorString=self.factorStrings[self.howMuchFaster], time=run.time)\
+					factorString=self.factorStrings[self.howMuchFaster], time=run.time,\
+					median=run.median, p95=run.p95,\
+					memory="" if run.peakMemory == None else "\n\tpeak memory: {0}".format(run.peakMemory))\
 				for run in self.runs\
 			])
 	
+	@property
+	def results(self):
+		"""The runs as a list of dicts, with the times in seconds and the peak memory in bytes."""
+		return [{"problem": run.problem.__name__, "factor": run.factor, "min": run.time,\
+			"median": run.median, "p95": run.p95, "peakMemory": run.peakMemory} for run in self.runs]
+	
+	@staticmethod
+	def percentile(times, percent):
+		"""The nearest-rank percentile of a list of times."""
+		ranked = sorted(times)
+		return ranked[max(0, math.ceil(len(ranked) * percent / 100) - 1)]
+	
 	def run(self, problems=None, iterations=None):
 		
 		"""Run a list of functions, adding the time it took to run it to self.runs.time."""
@@ -99,14 +131,33 @@ class Bench(object):
 			times = []
 			count = 0
 			for pausedIteration in range(0, iterations):
-				print("=== [Start] {0}".format(problem.__name__))
+				if not self.quiet: print("=== [Start] {0}".format(problem.__name__))
 				start, end = problem()
 				times.append(end-start)
-				print("=== [End] {0}".format(problem.__name__))
+				if not self.quiet: print("=== [End] {0}".format(problem.__name__))
 				count += 1
 			time = min(times)
-			self.runs.append(Run( problem, self.getFactor(time), time ))
-			
+			self.runs.append(Run( problem, self.getFactor(time), time, statistics.median(times),\
+				self.percentile(times, 95), self.getPeakMemory(problem) if self.measureMemory else None ))
+	
+	def getPeakMemory(self, problem):
+		
+		"""Run a function once more with tracemalloc tracing and return the peak of the memory
+		it allocated, in bytes. Memory allocated before the call doesn't count."""
+		
+		if tracemalloc.is_tracing():
+			# Someone else is tracing already, so we leave it running.
+			before = tracemalloc.get_traced_memory()[0]
+			tracemalloc.reset_peak()
+			problem()
+			return tracemalloc.get_traced_memory()[1] - before
+		tracemalloc.start()
+		try:
+			problem()
+			return tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+	
 	def getFactor(self, time):
 		
 		"""Get the comparison factor based on howMuchFaster.